@@ -0,0 +1,12 @@
+"""Query budgets for the account endpoints used by the storefront"""
+from apps.core.testing import PASSWORD, CatalogTestCase
+
+
+class AccountQueryBudgetTests(CatalogTestCase):
+    def test_login(self):
+        self.assertEndpointBudget(
+            'POST', '/api/accounts/login/', 2, payload={'username': self.user.username, 'password': PASSWORD},
+        )
+
+    def test_profile(self):
+        self.assertEndpointBudget('GET', '/api/accounts/profile/', 1, auth=True)
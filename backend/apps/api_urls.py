@@ -5,4 +5,5 @@ urlpatterns = [
     path("shipping/", include("apps.shipping.urls")),
     path("products/", include("apps.products.urls")),
     path("orders/", include("apps.orders.urls")),
+    path("core/", include("apps.core.urls")),
 ]
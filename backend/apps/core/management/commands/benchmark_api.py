@@ -0,0 +1,352 @@
+import json
+import os
+import platform
+import re
+import secrets
+import statistics
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from apps.products.models import Brand, Category, Product
+
+User = get_user_model()
+
+BENCH_USERNAME = 'benchmark-user'
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the hot API endpoints and report latency percentiles, throughput and SQL '
+        'query counts. Runs in-process inside a rolled-back transaction by default, or against '
+        'a running server with --base-url (query counts then come from its Server-Timing '
+        'header when REQUEST_TIMING_ENABLED is on). Populate the database first (e.g. generate_catalog).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint')
+        parser.add_argument('--base-url', default='', help='Benchmark a running server, e.g. http://localhost:8000')
+        parser.add_argument(
+            '--username', default=os.getenv('BENCHMARK_USERNAME'),
+            help='Existing account to log in with on --base-url (default: $BENCHMARK_USERNAME)',
+        )
+        parser.add_argument(
+            '--password', default=os.getenv('BENCHMARK_PASSWORD'),
+            help='Its password (default: $BENCHMARK_PASSWORD)',
+        )
+        parser.add_argument('--concurrency', type=int, default=1, help='Parallel clients (with --base-url only)')
+        parser.add_argument('--endpoints', default='', help='Comma separated subset of endpoint names')
+        parser.add_argument(
+            '--include-writes', action='store_true',
+            help='Also benchmark order creation; with --base-url this places real orders and queues their emails',
+        )
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline JSON from an earlier --output run')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed relative p95 slowdown before a regression is reported (default 0.2 = 20%%)',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        if options['concurrency'] > 1 and not options['base_url']:
+            raise CommandError('--concurrency needs --base-url; in-process runs share one connection')
+
+        if options['base_url']:
+            if not (options['username'] and options['password']):
+                raise CommandError(
+                    '--base-url needs an existing account: pass --username and --password '
+                    '(or set BENCHMARK_USERNAME and BENCHMARK_PASSWORD)'
+                )
+            self._prepare_user()
+            results = self.run_all()
+        else:
+            results = None
+            try:
+                with transaction.atomic():
+                    self._prepare_user()
+                    results = self.run_all()
+                    raise Rollback
+            except Rollback:
+                pass
+
+        report = {'meta': self.meta(), 'results': results}
+        self.print_results(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['compare']:
+            self.compare(results)
+
+    # Scenarios ------------------------------------------------------------
+
+    def scenarios(self):
+        product = (
+            Product.objects.filter(is_active=True, track_stock=False).first()
+            or Product.objects.filter(is_active=True, stock_quantity__gte=1000).first()
+            or Product.objects.filter(is_active=True).order_by('-stock_quantity').first()
+        )
+        if product is None:
+            raise CommandError('No active products to benchmark; run generate_catalog first')
+        category = Category.objects.filter(is_active=True, products__is_active=True).first() or product.category
+        brand = Brand.objects.filter(is_active=True, products__is_active=True).first() or product.brand
+        term = product.name.split()[-2] if len(product.name.split()) > 1 else product.name
+
+        order_payload = {
+            'first_name': 'Bench', 'last_name': 'Mark', 'email': 'benchmark@example.com',
+            'phone': '0200000000', 'shipping_address': 'Benchmark', 'city': 'Accra',
+            'region': 'Greater Accra', 'payment_method': 'cod',
+            'items': [{'product_id': product.pk, 'quantity': 1}],
+        }
+        scenarios = [
+            ('product_list', 'GET', '/api/products/', None, False),
+            ('product_list_filtered', 'GET', '/api/products/?' + urlencode({
+                'category_slug': category.slug, 'ordering': '-price', 'min_price': 1,
+            }), None, False),
+            ('product_list_search', 'GET', '/api/products/?' + urlencode({'search': term}), None, False),
+            ('product_list_cursor', 'GET', '/api/products/?pagination=cursor', None, False),
+            ('product_detail', 'GET', f'/api/products/{product.slug}/', None, False),
+            ('search_suggestions', 'GET', '/api/products/search/?' + urlencode({'q': term[:3]}), None, False),
+            ('categories', 'GET', '/api/products/categories/', None, False),
+            ('category_tree', 'GET', '/api/products/categories/tree/', None, False),
+            ('brands', 'GET', '/api/products/brands/', None, False),
+            ('category_products', 'GET', f'/api/products/categories/{category.slug}/', None, False),
+            ('brand_products', 'GET', f'/api/products/brands/{brand.slug}/', None, False),
+            ('login', 'POST', '/api/accounts/login/', {'username': self.username, 'password': self.password}, False),
+            ('order_list', 'GET', '/api/orders/list/', None, True),
+            ('order_list_summary', 'GET', '/api/orders/list/?view=summary', None, True),
+        ]
+        if self.options['include_writes']:
+            scenarios.append(('order_create', 'POST', '/api/orders/create/', order_payload, True))
+
+        wanted = {name.strip() for name in self.options['endpoints'].split(',') if name.strip()}
+        if wanted:
+            unknown = wanted - {scenario[0] for scenario in scenarios}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            scenarios = [scenario for scenario in scenarios if scenario[0] in wanted]
+        return scenarios
+
+    def _prepare_user(self):
+        if self.options['base_url']:
+            # Never create accounts on the target; log in with the given one
+            self.username, self.password = self.options['username'], self.options['password']
+            status, body = self._http_request('POST', '/api/accounts/login/', {
+                'username': self.username, 'password': self.password,
+            })
+            if status != 200:
+                raise CommandError(f'Benchmark login failed with HTTP {status}')
+            self.token = json.loads(body)['tokens']['access']
+        else:
+            # Created inside the rolled back transaction, with a throwaway password
+            from rest_framework_simplejwt.tokens import RefreshToken
+            self.username, self.password = BENCH_USERNAME, secrets.token_urlsafe(16)
+            user, _ = User.objects.get_or_create(
+                username=self.username, defaults={'email': 'benchmark-user@example.com'}
+            )
+            user.set_password(self.password)
+            user.save(update_fields=['password'])
+            self.token = str(RefreshToken.for_user(user).access_token)
+
+    # Runners --------------------------------------------------------------
+
+    def run_all(self):
+        results = {}
+        for name, method, path, payload, auth in self.scenarios():
+            self.stdout.write(f'Benchmarking {name} ({method} {path})...')
+            if self.options['base_url']:
+                samples, elapsed = self._run_http(method, path, payload, auth)
+            else:
+                samples, elapsed = self._run_in_process(method, path, payload, auth)
+            results[name] = self.summarize(method, path, samples, elapsed)
+        return results
+
+    def _run_in_process(self, method, path, payload, auth):
+        client = Client(raise_request_exception=False)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.token}'} if auth else {}
+
+        def request():
+            if method == 'GET':
+                return client.get(path, **headers)
+            return client.post(path, payload, content_type='application/json', **headers)
+
+        for _ in range(self.options['warmup']):
+            request()
+
+        samples = []
+        started = time.perf_counter()
+        for _ in range(self.options['requests']):
+            with CaptureQueriesContext(connection) as queries:
+                request_started = time.perf_counter()
+                response = request()
+                latency = time.perf_counter() - request_started
+            samples.append({
+                'latency': latency,
+                'status': response.status_code,
+                'queries': len(queries.captured_queries),
+                'query_time': sum(float(query['time']) for query in queries.captured_queries),
+            })
+        return samples, time.perf_counter() - started
+
+    def _run_http(self, method, path, payload, auth):
+        def request():
+            request_started = time.perf_counter()
+            status, _, headers = self._http_request(method, path, payload, auth=auth, with_headers=True)
+            sample = {'latency': time.perf_counter() - request_started, 'status': status}
+            # Servers running with REQUEST_TIMING_ENABLED report their DB work in Server-Timing
+            match = SERVER_TIMING_DB.search(headers.get('Server-Timing', ''))
+            if match:
+                sample['query_time'] = float(match.group(1)) / 1000
+                sample['queries'] = int(match.group(2))
+            return sample
+
+        for _ in range(self.options['warmup']):
+            request()
+
+        samples = []
+        lock = threading.Lock()
+        remaining = [self.options['requests']]
+
+        def worker():
+            while True:
+                with lock:
+                    if not remaining[0]:
+                        return
+                    remaining[0] -= 1
+                sample = request()
+                with lock:
+                    samples.append(sample)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(self.options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - started
+
+    def _http_request(self, method, path, payload=None, auth=False, with_headers=False):
+        headers = {'Content-Type': 'application/json'}
+        if auth:
+            headers['Authorization'] = f'Bearer {self.token}'
+        request = urllib.request.Request(
+            self.options['base_url'].rstrip('/') + path, method=method, headers=headers,
+            data=json.dumps(payload).encode() if payload is not None else None,
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                result = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            result = e.code, e.read(), e.headers
+        except urllib.error.URLError as e:
+            result = type(e.reason).__name__, b'', {}
+        return result if with_headers else result[:2]
+
+    # Reporting ------------------------------------------------------------
+
+    def summarize(self, method, path, samples, elapsed):
+        latencies = sorted(sample['latency'] * 1000 for sample in samples)
+        statuses = Counter(str(sample['status']) for sample in samples)
+        errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+        summary = {
+            'method': method,
+            'path': path,
+            'requests': len(samples),
+            'errors': errors,
+            'statuses': dict(statuses),
+            'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+            'mean_ms': round(statistics.fmean(latencies), 2) if latencies else None,
+            'p50_ms': round(percentile(latencies, 0.50), 2) if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95), 2) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99), 2) if latencies else None,
+            'max_ms': round(latencies[-1], 2) if latencies else None,
+        }
+        if samples and all('queries' in sample for sample in samples):
+            summary['queries_mean'] = round(statistics.fmean(sample['queries'] for sample in samples), 2)
+            summary['queries_max'] = max(sample['queries'] for sample in samples)
+            summary['query_time_ms_mean'] = round(
+                statistics.fmean(sample['query_time'] for sample in samples) * 1000, 2
+            )
+        return summary
+
+    def meta(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            commit = ''
+        return {
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'mode': 'http' if self.options['base_url'] else 'in-process',
+            'base_url': self.options['base_url'],
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'requests': self.options['requests'],
+            'concurrency': self.options['concurrency'],
+            'products': Product.objects.count(),
+        }
+
+    def print_results(self, results):
+        header = f"{'endpoint':<24}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'db ms':>9}{'errors':>8}"
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, result in results.items():
+            columns = ['throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'query_time_ms_mean']
+            values = ''.join(
+                f'{result[key]:>9.1f}' if result.get(key) is not None else f"{'-':>9}" for key in columns
+            )
+            self.stdout.write(f"{name:<24}{values}{result['errors']:>8}")
+
+    def compare(self, results):
+        with open(self.options['compare']) as f:
+            baseline = json.load(f)['results']
+
+        threshold = self.options['threshold']
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            if before.get('p95_ms') and result['p95_ms'] and result['p95_ms'] > before['p95_ms'] * (1 + threshold):
+                regressions.append(f"{name}: p95 {before['p95_ms']:.1f}ms -> {result['p95_ms']:.1f}ms")
+            if 'queries_max' in before and result.get('queries_max', 0) > before['queries_max']:
+                regressions.append(f"{name}: queries {before['queries_max']} -> {result['queries_max']}")
+            if result['errors'] > before.get('errors', 0):
+                regressions.append(f"{name}: errors {before.get('errors', 0)} -> {result['errors']}")
+
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f'{len(regressions)} regression(s) against {self.options["compare"]}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {self.options["compare"]}'))
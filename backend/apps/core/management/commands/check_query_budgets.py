@@ -0,0 +1,27 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+BUDGET_TESTS = [
+    'apps.products.tests.CatalogQueryBudgetTests',
+    'apps.accounts.tests.AccountQueryBudgetTests',
+    'apps.orders.tests.OrderQueryBudgetTests',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Run only the per-endpoint SQL query budget tests (the *QueryBudgetTests classes in '
+        'apps/*/tests.py), which fail on N+1 regressions. `manage.py test` runs them too.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoints', default='',
+            help='Comma separated subset of endpoint names (test names without the test_ prefix)',
+        )
+
+    def handle(self, *args, **options):
+        patterns = [f'test_{name.strip()}' for name in options['endpoints'].split(',') if name.strip()]
+        call_command(
+            'test', *BUDGET_TESTS, test_name_patterns=patterns or None, verbosity=options['verbosity'],
+        )
@@ -0,0 +1,163 @@
+"""
+Opt-in request timing (REQUEST_TIMING_ENABLED)
+
+Each request gets a `Server-Timing` header and a log line with its DB query
+count and time, view time (including DRF serializers, which run in the
+view), render time (JSON encoding) and total time, and the total is
+recorded in a per-URL-name rolling window so recent percentiles can be
+read from the staff-only /api/core/timings/ endpoint. Statistics are kept
+per process; every worker reports its own.
+
+When the setting is off the middleware raises MiddlewareNotUsed and Django
+drops it from the chain, so it costs nothing.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger('apps.core.timing')
+
+BUCKET_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class RouteTimings:
+    """Cumulative histogram plus a window of the most recent samples for one route"""
+
+    def __init__(self, window):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.recent = deque(maxlen=window)
+
+    def add(self, total_ms, db_ms, queries, status):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, total_ms)] += 1
+        self.count += 1
+        if status >= 500:
+            self.errors += 1
+        self.recent.append((total_ms, db_ms, queries))
+
+    def snapshot(self):
+        totals = sorted(sample[0] for sample in self.recent)
+        window = len(totals)
+
+        def pct(fraction):
+            return round(totals[min(window - 1, int(fraction * window))], 2) if window else None
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'window': window,
+            'p50_ms': pct(0.50),
+            'p95_ms': pct(0.95),
+            'p99_ms': pct(0.99),
+            'max_ms': round(totals[-1], 2) if window else None,
+            'db_ms_mean': round(sum(s[1] for s in self.recent) / window, 2) if window else None,
+            'queries_mean': round(sum(s[2] for s in self.recent) / window, 2) if window else None,
+            'histogram': {
+                f'le_{bound}ms' if bound else 'inf': count
+                for bound, count in zip(BUCKET_BOUNDS_MS + (None,), self.buckets)
+            },
+        }
+
+
+class TimingRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, total_ms, db_ms, queries, status):
+        window = getattr(settings, 'REQUEST_TIMING_WINDOW', 1000)
+        with self._lock:
+            timings = self._routes.get(route)
+            if timings is None:
+                timings = self._routes[route] = RouteTimings(window)
+            timings.add(total_ms, db_ms, queries, status)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: timings.snapshot() for route, timings in sorted(self._routes.items())}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = TimingRegistry()
+
+
+class QueryTimer:
+    """connection.execute_wrapper hook that counts queries and sums their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        request._timing = {'render_started': None, 'render_ended': None}
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        marks = request._timing
+        render = 0.0
+        if marks['render_started'] is not None and marks['render_ended'] is not None:
+            render = marks['render_ended'] - marks['render_started']
+        # Queries issued while rendering (lazy querysets) count as DB time, not view time
+        view = max(0.0, total - render - timer.elapsed)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timer.elapsed * 1000:.1f};desc="{timer.count} queries"',
+            f'view;dur={view * 1000:.1f}',
+            f'render;dur={render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        match = request.resolver_match
+        route = match.view_name if match else '<unresolved>'
+        registry.record(route, total * 1000, timer.elapsed * 1000, timer.count, response.status_code)
+        logger.info(
+            'request method=%s route=%s status=%s total_ms=%.1f db_ms=%.1f queries=%d view_ms=%.1f render_ms=%.1f',
+            request.method, route, response.status_code, total * 1000, timer.elapsed * 1000, timer.count,
+            view * 1000, render * 1000,
+            extra={
+                'route': route, 'status_code': response.status_code, 'total_ms': total * 1000,
+                'db_ms': timer.elapsed * 1000, 'queries': timer.count,
+            },
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook returns, so time from
+        # here to the post-render callback is the renderer (JSON encoding)
+        # cost; serializer.data already ran inside the view
+        marks = request._timing
+
+        def rendered(response):
+            marks['render_ended'] = time.perf_counter()
+
+        marks['render_started'] = time.perf_counter()
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,134 @@
+"""
+Keyset (cursor) pagination on (created_at, id)
+
+Pages are fetched with `WHERE (created_at, id) < cursor ORDER BY created_at
+DESC, id DESC LIMIT n`, so deep pages cost the same as the first one and no
+COUNT(*) runs unless the client asks for it with `count=true`.
+"""
+import base64
+import binascii
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def wants_keyset(request):
+    """Keyset mode is selected with `pagination=cursor` or by following a cursor link"""
+    return (
+        request.query_params.get('pagination') == 'cursor'
+        or KeysetPagination.cursor_query_param in request.query_params
+    )
+
+
+class KeysetPagination(pagination.BasePagination):
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering = ('-created_at', '-pk')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is not None:
+            created_at, pk = cursor
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split('|', 1)
+            created_at = parse_datetime(created_at)
+            # Integer or UUID, whatever the paginated model uses
+            pk = model._meta.pk.to_python(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError, ValidationError):
+            raise NotFound('Invalid cursor')
+        if created_at is None or pk is None:
+            raise NotFound('Invalid cursor')
+        return created_at, pk
+
+    def encode_cursor(self, obj):
+        raw = f'{obj.created_at.isoformat()}|{obj.pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last))
+
+    def get_paginated_response(self, data):
+        body = OrderedDict()
+        if self.count is not None:
+            body['count'] = self.count
+        body['next'] = self.get_next_link()
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetOptInMixin:
+    """
+    Switch a paginator to KeysetPagination when the request asks for it and
+    fall back to the class's own behaviour otherwise
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if wants_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class NoPagination(pagination.BasePagination):
+    """Default for endpoints whose clients expect a plain list"""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return None
@@ -0,0 +1,166 @@
+"""
+Query capture and budgets for catching N+1 regressions
+
+    with assert_max_queries(4):
+        client.get('/api/products/')
+
+Queries are grouped by a fingerprint of their SQL with literals and IN
+lists normalised away, so the same statement issued once per row shows up
+as one fingerprint repeated N times. When a budget is exceeded, or a
+fingerprint repeats more often than allowed, the error lists the repeated
+statements together with the project stack frames that issued them.
+
+`assert_max_queries` works as a plain context manager (pytest or scripts);
+`QueryBudgetMixin` adds `assertQueryBudget` to Django test cases.
+"""
+import re
+import time
+import traceback
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?|\$\d+)\s*,)+\s*(?:%s|\?|\$\d+)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+_SAVEPOINT = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+
+
+def fingerprint(sql):
+    """Normalise SQL so statements differing only in parameters compare equal"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = sql.replace('%s', '?')
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _project_stack():
+    """Stack frames from this project, innermost last, without Django or library frames"""
+    base = str(settings.BASE_DIR)
+    return [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith('querycount.py')
+    ]
+
+
+class CapturedQuery:
+    __slots__ = ('sql', 'fingerprint', 'duration', 'stack')
+
+    def __init__(self, sql, duration, stack):
+        self.sql = sql
+        self.fingerprint = fingerprint(sql)
+        self.duration = duration
+        self.stack = stack
+
+
+class QueryCapture:
+    """
+    Record every query run on a connection while the block executes
+
+    Unlike CaptureQueriesContext this does not depend on DEBUG cursors and
+    keeps the issuing stack for each statement. Savepoint bookkeeping is
+    ignored.
+    """
+
+    def __init__(self, using='default', stacks=True):
+        self.connection = connections[using]
+        self.stacks = stacks
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not _SAVEPOINT.match(sql):
+                stack = _project_stack() if self.stacks else []
+                self.queries.append(CapturedQuery(sql, time.perf_counter() - started, stack))
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(query.duration for query in self.queries)
+
+    def duplicates(self, threshold=2):
+        """Fingerprints issued at least `threshold` times, most repeated first"""
+        groups = OrderedDict()
+        for query in self.queries:
+            groups.setdefault(query.fingerprint, []).append(query)
+        repeated = [(fp, queries) for fp, queries in groups.items() if len(queries) >= threshold]
+        return OrderedDict(sorted(repeated, key=lambda item: -len(item[1])))
+
+    def report(self, threshold=2, max_stack=6):
+        lines = [f'{self.count} queries, {self.duration * 1000:.1f}ms']
+        for fp, queries in self.duplicates(threshold).items():
+            lines.append(f'\n{len(queries)}x {fp[:300]}')
+            for frame in queries[0].stack[-max_stack:]:
+                lines.append(f'    {frame.filename}:{frame.lineno} in {frame.name}')
+                if frame.line:
+                    lines.append(f'      {frame.line}')
+        return '\n'.join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, message, capture):
+        super().__init__(message)
+        self.capture = capture
+
+
+def check_budget(capture, budget, max_repeats=None, label=''):
+    """Raise QueryBudgetExceeded if the capture is over budget or repeats a statement too often"""
+    problems = []
+    if capture.count > budget:
+        problems.append(f'{capture.count} queries, budget is {budget}')
+    if max_repeats is not None:
+        worst = next(iter(capture.duplicates(max_repeats + 1).values()), None)
+        if worst:
+            problems.append(f'a statement ran {len(worst)} times, at most {max_repeats} allowed')
+    if problems:
+        prefix = f'{label}: ' if label else ''
+        raise QueryBudgetExceeded(f"{prefix}{'; '.join(problems)}\n{capture.report()}", capture)
+
+
+@contextmanager
+def assert_max_queries(budget, max_repeats=None, using='default', label=''):
+    """
+    Fail if the block runs more than `budget` queries, or (when given) repeats
+    any fingerprint more than `max_repeats` times. Usable from pytest as is.
+    """
+    with QueryCapture(using=using) as capture:
+        yield capture
+    check_budget(capture, budget, max_repeats=max_repeats, label=label)
+
+
+class QueryBudgetMixin:
+    """TestCase mixin: `with self.assertQueryBudget(5): self.client.get(url)`"""
+
+    def assertQueryBudget(self, budget, max_repeats=None, using='default'):
+        return _test_budget(self, budget, max_repeats, using)
+
+
+@contextmanager
+def _test_budget(test_case, budget, max_repeats, using):
+    try:
+        with assert_max_queries(budget, max_repeats=max_repeats, using=using) as capture:
+            yield capture
+    except QueryBudgetExceeded as e:
+        test_case.fail(str(e))
@@ -0,0 +1,80 @@
+"""
+Shared fixture for the API tests (apps/*/tests.py)
+
+A small synthetic catalog with enough images, specs, reviews and warehouse
+rows per product that a per-row lazy load shows up as a repeated statement.
+The cache is a dummy, so query budgets are measured cold: every request has
+to hit the database.
+"""
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+
+from apps.core.querycount import QueryBudgetMixin
+from apps.products.models import Product
+from apps.products.search import invalidate_index
+from apps.products.synthetic import CatalogGenerator
+
+User = get_user_model()
+
+PREFIX = 'qbudget'
+PASSWORD = 'qbudget-password'
+DUMMY_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+@override_settings(CACHES=DUMMY_CACHE)
+class CatalogTestCase(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = CatalogGenerator(seed=7, prefix=PREFIX)
+        categories = generator.create_categories(5)
+        brands = generator.create_brands(3)
+        cls.warehouses = warehouses = generator.create_warehouses(2)
+        user_ids = generator.create_users(5)
+        generator.create_products(
+            40, categories=categories, brands=brands, warehouses=warehouses, user_ids=user_ids,
+            images_per_product=3, specs_per_product=4, reviews_per_product=2,
+        )
+        generator.finish()
+
+        cls.user = User.objects.get(pk=user_ids[0])
+        cls.user.set_password(PASSWORD)
+        cls.user.save(update_fields=['password'])
+
+        products = Product.objects.filter(slug__startswith=f'{PREFIX}-product-', is_active=True)
+        cls.product = products.filter(reviews__isnull=False).order_by('pk').first()
+        cls.in_stock = [p for p in products.order_by('pk') if not p.track_stock or p.stock_quantity >= 10][:3]
+        cls.token = Client().post(
+            '/api/accounts/login/', {'username': cls.user.username, 'password': PASSWORD},
+            content_type='application/json',
+        ).json()['tokens']['access']
+
+    @classmethod
+    def tearDownClass(cls):
+        # The in-process search index may hold the rolled back catalog
+        invalidate_index()
+        super().tearDownClass()
+
+    def request(self, method, path, auth=False, payload=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.token}'} if auth else {}
+        if method == 'GET':
+            return self.client.get(path, **headers)
+        return self.client.post(path, payload, content_type='application/json', **headers)
+
+    def assertEndpointBudget(self, method, path, budget, max_repeats=1, auth=False, payload=None):
+        """Request the endpoint, failing on errors or when it is over its query budget"""
+        with self.assertQueryBudget(budget, max_repeats=max_repeats):
+            response = self.request(method, path, auth, payload)
+        self.assertLess(response.status_code, 400, f'{method} {path} returned HTTP {response.status_code}')
+        return response
+
+    def follow_pages(self, path, auth=False, key='id'):
+        """GET path and every `next` link after it; returns (pages, [key of each result])"""
+        pages, keys = 0, []
+        while path:
+            response = self.request('GET', path, auth)
+            self.assertEqual(response.status_code, 200, f'GET {path}: {response.content[:200]}')
+            body = response.json()
+            pages += 1
+            keys += [result[key] for result in body['results']]
+            path = body['next']
+        return pages, keys
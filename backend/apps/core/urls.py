@@ -5,4 +5,5 @@ app_name = 'core'
 
 urlpatterns = [
     path('health/', views.health_check, name='health-check'),
+    path('timings/', views.request_timings, name='request-timings'),
 ]
@@ -1,6 +1,12 @@
+from django.conf import settings
 from django.http import JsonResponse
 from django.db import connection
 from django.core.cache import cache
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .middleware import registry
 
 
 def health_check(request):
@@ -35,3 +41,15 @@ def health_check(request):
     
     status_code = 200 if overall_status == "healthy" else 503
     return JsonResponse(response_data, status=status_code)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+def request_timings(request):
+    """Rolling per-route timings collected by RequestTimingMiddleware (this process only)"""
+    if request.method == 'DELETE':
+        registry.reset()
+    return Response({
+        'enabled': settings.REQUEST_TIMING_ENABLED,
+        'routes': registry.snapshot(),
+    })
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.orders.notifications import RateLimiter, get_transport, process_due_notifications
+
+
+class Command(BaseCommand):
+    help = 'Drain the order email outbox (run as a long-lived worker process)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when no due notifications remain')
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to sleep when idle')
+        parser.add_argument(
+            '--rate', type=float, default=getattr(settings, 'ORDER_EMAIL_RATE_LIMIT', 2.0),
+            help='Maximum emails sent per second',
+        )
+
+    def handle(self, *args, **options):
+        transport = get_transport()
+        rate_limiter = RateLimiter(options['rate'])
+        self.stdout.write(f"Sending order notifications via {transport.name} transport")
+
+        try:
+            while True:
+                sent, failed = process_due_notifications(
+                    transport=transport,
+                    rate_limiter=rate_limiter,
+                    batch_size=options['batch_size'],
+                )
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent}, failed {failed}")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('Order notification worker stopped'))
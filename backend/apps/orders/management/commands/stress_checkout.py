@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client
+
+from apps.orders.models import Order, OrderItem
+from apps.products.ledger import stock_levels
+from apps.products.models import Brand, Category, Product, Warehouse, WarehouseStock
+
+STRESS_SKU = 'STRESS-CHECKOUT-SKU'
+
+
+class Command(BaseCommand):
+    help = 'Hammer order creation from parallel threads and verify stock is never oversold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--orders', type=int, default=64, help='Total checkout attempts')
+        parser.add_argument('--stock', type=int, default=20, help='Units spread across two warehouses')
+        parser.add_argument('--quantity', type=int, default=1, help='Units per order')
+        parser.add_argument(
+            '--url', default='',
+            help='Base URL of a running server (e.g. http://localhost:8000); defaults to in-process requests',
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the stress product and its orders')
+
+    def handle(self, *args, **options):
+        product = self._setup_product(options['stock'])
+        payload = {
+            'first_name': 'Stress', 'last_name': 'Test', 'email': 'stress@example.com',
+            'phone': '0200000000', 'shipping_address': 'Load test', 'city': 'Accra',
+            'region': 'Greater Accra', 'payment_method': 'cod',
+            'items': [{'product_id': product.pk, 'quantity': options['quantity']}],
+        }
+        post = self._http_post(options['url']) if options['url'] else self._client_post
+
+        results = Counter()
+        lock = threading.Lock()
+        remaining = [options['orders']]
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if not remaining[0]:
+                            return
+                        remaining[0] -= 1
+                    try:
+                        status = post(payload)
+                    except Exception as e:
+                        status = type(e).__name__
+                    with lock:
+                        results[status] += 1
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        committed = Order.objects.filter(items__product=product).distinct().count()
+        sold = OrderItem.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        left = WarehouseStock.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        ledger = sum(stock_levels([product.pk]).values())
+        product.refresh_from_db()
+
+        self.stdout.write(f"{options['orders']} attempts from {options['threads']} threads in {elapsed:.2f}s")
+        for status, count in sorted(results.items(), key=lambda item: str(item[0])):
+            self.stdout.write(f"  {status}: {count}")
+        self.stdout.write(
+            f"Orders committed {committed}, initial stock {options['stock']}, sold {sold}, "
+            f"warehouse stock left {left}, product stock_quantity {product.stock_quantity}, ledger {ledger}"
+        )
+
+        oversold = sold > options['stock'] or sold + left != options['stock']
+        drifted = product.stock_quantity != left or ledger != left
+        if not options['keep']:
+            self._cleanup(product)
+        if oversold:
+            raise CommandError('Stock was oversold or lost under concurrent checkout')
+        if drifted:
+            raise CommandError('Product stock_quantity or the stock ledger drifted from the warehouse total under concurrent checkout')
+        self.stdout.write(self.style.SUCCESS('No oversell detected'))
+
+    def _client_post(self, payload):
+        response = Client(raise_request_exception=False).post('/api/orders/create/', payload, content_type='application/json')
+        return response.status_code
+
+    def _http_post(self, base_url):
+        url = f"{base_url.rstrip('/')}/api/orders/create/"
+
+        def post(payload):
+            request = urllib.request.Request(
+                url, data=json.dumps(payload).encode(), headers={'Content-Type': 'application/json'}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        return post
+
+    def _setup_product(self, stock):
+        category, _ = Category.objects.get_or_create(slug='stress-test', defaults={'name': 'Stress Test'})
+        brand, _ = Brand.objects.get_or_create(slug='stress-test', defaults={'name': 'Stress Test'})
+        self._cleanup_orders()
+        product, _ = Product.objects.update_or_create(
+            sku=STRESS_SKU,
+            defaults={
+                'name': 'Stress Test Product', 'slug': 'stress-test-product',
+                'description': 'Created by stress_checkout', 'category': category, 'brand': brand,
+                'price': Decimal('10.00'), 'track_stock': True, 'stock_quantity': stock, 'is_active': True,
+            },
+        )
+        warehouses = [
+            Warehouse.objects.get_or_create(
+                code=code, defaults={'name': f'Stress {code}', 'address': 'Load test', 'phone': '0'}
+            )[0]
+            for code in ('STRESS-A', 'STRESS-B')
+        ]
+        split = [stock // 2, stock - stock // 2]
+        for warehouse, quantity in zip(warehouses, split):
+            WarehouseStock.objects.update_or_create(
+                product=product, warehouse=warehouse, defaults={'quantity': quantity}
+            )
+        return product
+
+    def _cleanup_orders(self):
+        Order.objects.filter(items__product__sku=STRESS_SKU).delete()
+
+    def _cleanup(self, product):
+        self._cleanup_orders()
+        product.delete()
+        Warehouse.objects.filter(code__in=['STRESS-A', 'STRESS-B']).delete()
+        Category.objects.filter(slug='stress-test').delete()
+        Brand.objects.filter(slug='stress-test').delete()
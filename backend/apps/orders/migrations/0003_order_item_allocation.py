@@ -0,0 +1,24 @@
+# Generated by Django 5.0.7 on 2026-10-17 15:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_notification_outbox'),
+        ('products', '0003_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItemAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('order_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='orders.orderitem')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='products.warehouse')),
+            ],
+        ),
+    ]
@@ -1,7 +1,38 @@
+import secrets
+import time
 import uuid
 from django.db import models
 from django.conf import settings
-from apps.products.models import Product
+from django.utils import timezone
+from apps.products.models import Product, Warehouse
+
+
+def generate_order_number():
+    """
+    Time-ordered order number: millisecond timestamp plus 32 random bits
+
+    A clash needs two orders in the same millisecond drawing the same suffix,
+    so no existence check is made (the unique constraint still guards it).
+    """
+    timestamp = int(time.time() * 1000)
+    return f"ORD-{timestamp}-{secrets.token_hex(4).upper()}"
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_details(self):
+        """Prefetch everything OrderSerializer nests, in a fixed number of queries"""
+        return self.prefetch_related(
+            'items',
+            models.Prefetch(
+                'status_updates',
+                queryset=OrderStatusUpdate.objects.select_related('created_by'),
+            ),
+        )
+
+    def with_summary(self):
+        """Annotations used by OrderSummarySerializer instead of nested rows"""
+        # Meta.ordering is not applied to aggregate queries, so restate it
+        return self.annotate(item_count=models.Count('items')).order_by('-created_at')
 
 
 class Order(models.Model):
@@ -64,6 +95,8 @@ class Order(models.Model):
     tracking_number = models.CharField(max_length=100, blank=True)
     estimated_delivery = models.DateField(null=True, blank=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
 
@@ -72,18 +105,7 @@ class Order(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            # Generate unique order number using timestamp and random suffix
-            import time
-            import random
-            
-            timestamp = int(time.time())
-            random_suffix = random.randint(1000, 9999)
-            self.order_number = f"ORD-{timestamp}-{random_suffix}"
-            
-            # Ensure uniqueness (very unlikely to have collision)
-            while Order.objects.filter(order_number=self.order_number).exists():
-                random_suffix = random.randint(1000, 9999)
-                self.order_number = f"ORD-{timestamp}-{random_suffix}"
+            self.order_number = generate_order_number()
         
         super().save(*args, **kwargs)
 
@@ -108,6 +130,16 @@ class OrderItem(models.Model):
         return self.price * self.quantity
 
 
+class OrderItemAllocation(models.Model):
+    """Units of an order item reserved from a specific warehouse at checkout"""
+    order_item = models.ForeignKey(OrderItem, related_name='allocations', on_delete=models.CASCADE)
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.quantity} x {self.order_item.product_name} from {self.warehouse.code}"
+
+
 class OrderStatusUpdate(models.Model):
     order = models.ForeignKey(Order, related_name='status_updates', on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
@@ -120,3 +152,37 @@ class OrderStatusUpdate(models.Model):
 
     def __str__(self):
         return f"Order {self.order.order_number} - {self.status}"
+
+
+class OrderNotification(models.Model):
+    """Outbox row for an order email, drained by the send_order_notifications worker"""
+    KIND_CHOICES = [
+        ('customer', 'Customer confirmation'),
+        ('admin', 'Admin new order alert'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    order = models.ForeignKey(Order, related_name='notifications', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    recipient = models.EmailField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    provider_message_id = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='order_notif_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for order {self.order.order_number} ({self.status})"
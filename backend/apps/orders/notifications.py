@@ -0,0 +1,206 @@
+"""
+Order email outbox
+
+Checkout only writes OrderNotification rows (in the same transaction as the
+order); the send_order_notifications management command renders and delivers
+them with retries, exponential backoff and a send rate limit.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import OrderNotification
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+# A claimed batch is hidden from other workers for this long; rows left
+# unrecorded by a crashed worker become due again afterwards
+CLAIM_SECONDS = 10 * 60
+
+
+def enqueue_order_notifications(order):
+    """Queue the customer confirmation and admin alert for a new order"""
+    return OrderNotification.objects.bulk_create([
+        OrderNotification(order=order, kind='customer', recipient=order.email),
+        OrderNotification(order=order, kind='admin', recipient=settings.ADMIN_EMAIL),
+    ])
+
+
+def render_notification(notification):
+    """Return (subject, html) for an outbox row"""
+    order = notification.order
+    if notification.kind == 'admin':
+        subject = f"New Order Received - {order.order_number}"
+        customer_name = "Admin"
+    else:
+        subject = f"Order Confirmation - {order.order_number}"
+        customer_name = f"{order.first_name} {order.last_name}"
+
+    html = render_to_string('emails/order_confirmation.html', {
+        'order': order,
+        'customer_name': customer_name,
+        'is_admin': notification.kind == 'admin',
+    })
+    return subject, html
+
+
+class DjangoMailTransport:
+    """Deliver through Django's EMAIL_BACKEND (console backend locally)"""
+    name = 'django'
+
+    def send(self, *, recipient, subject, html):
+        send_mail(
+            subject=subject,
+            message='',  # HTML email, so plain text is empty
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[recipient],
+            html_message=html,
+            fail_silently=False,
+        )
+        return ''
+
+
+class ResendTransport:
+    """Deliver through the Resend API"""
+    name = 'resend'
+
+    def __init__(self):
+        import resend
+        resend.api_key = settings.RESEND_API_KEY
+        self._resend = resend
+
+    def send(self, *, recipient, subject, html):
+        # For Resend free tier, send to the verified address until a domain is verified
+        if not getattr(settings, 'RESEND_DOMAIN_VERIFIED', False):
+            recipient = settings.ADMIN_EMAIL
+
+        result = self._resend.Emails.send({
+            "from": getattr(settings, 'RESEND_FROM_EMAIL', settings.DEFAULT_FROM_EMAIL),
+            "to": [recipient],
+            "subject": subject,
+            "html": html,
+        })
+        return str(result.get('id', ''))
+
+
+def get_transport():
+    """
+    Pick the delivery transport from ORDER_EMAIL_TRANSPORT
+
+    `auto` uses Resend when an API key is configured and the package is
+    installed, otherwise Django's mail backend.
+    """
+    choice = getattr(settings, 'ORDER_EMAIL_TRANSPORT', 'auto')
+    if choice == 'django':
+        return DjangoMailTransport()
+    if choice == 'resend':
+        return ResendTransport()
+
+    if getattr(settings, 'RESEND_API_KEY', None):
+        try:
+            return ResendTransport()
+        except ImportError:
+            logger.warning("Resend package not installed - falling back to Django mail backend")
+    return DjangoMailTransport()
+
+
+def backoff_delay(attempts):
+    """Exponential backoff for the given number of failed attempts"""
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+class RateLimiter:
+    """Space out sends so we stay under the provider's requests-per-second limit"""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second > 0 else 0
+        self._last = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        delay = self._last + self.interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._last = time.monotonic()
+
+
+def deliver(notification, transport):
+    """Send one notification and record the outcome on the row"""
+    notification.attempts += 1
+    try:
+        subject, html = render_notification(notification)
+        message_id = transport.send(recipient=notification.recipient, subject=subject, html=html)
+    except Exception as e:
+        notification.last_error = f"{type(e).__name__}: {e}"
+        max_attempts = getattr(settings, 'ORDER_EMAIL_MAX_ATTEMPTS', 5)
+        if notification.attempts >= max_attempts:
+            notification.status = 'failed'
+            logger.error("Giving up on %s after %s attempts: %s", notification, notification.attempts, e)
+        else:
+            notification.next_attempt_at = timezone.now() + backoff_delay(notification.attempts)
+            logger.warning("Failed to send %s (attempt %s): %s", notification, notification.attempts, e)
+    else:
+        notification.status = 'sent'
+        notification.sent_at = timezone.now()
+        notification.provider_message_id = message_id or ''
+        notification.last_error = ''
+
+    notification.save(update_fields=[
+        'attempts', 'status', 'next_attempt_at', 'last_error', 'provider_message_id', 'sent_at',
+    ])
+    return notification.status == 'sent'
+
+
+def claim_due_notifications(batch_size):
+    """
+    Claim a batch of due notifications for this worker
+
+    Rows are locked with SKIP LOCKED so several workers can drain the outbox
+    without picking the same rows, and their next_attempt_at is pushed
+    CLAIM_SECONDS ahead before the (short) transaction commits, so no row
+    lock is held while mail is being sent.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OrderNotification.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('order')
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if batch:
+            OrderNotification.objects.filter(pk__in=[n.pk for n in batch]).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS),
+            )
+    return batch
+
+
+def process_due_notifications(*, transport, rate_limiter, batch_size=20):
+    """
+    Deliver one batch of due notifications
+
+    The batch is claimed first (see claim_due_notifications); each result is
+    then recorded as soon as that email is sent, so a crash part way through
+    only leaves the unsent rows to be retried.
+
+    Returns:
+        Tuple of (sent, failed) counts for the batch
+    """
+    sent = failed = 0
+    for notification in claim_due_notifications(batch_size):
+        rate_limiter.wait()
+        if deliver(notification, transport):
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed
@@ -1,5 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Order, OrderItem, OrderStatusUpdate
+from apps.products.models import Product
+from apps.products.stock import InsufficientStock, reserve_stock
+from .models import Order, OrderItem, OrderItemAllocation, OrderStatusUpdate, generate_order_number
+from .notifications import enqueue_order_notifications
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -49,11 +53,33 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
 
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Compact order row for dashboards; expects Order.objects.with_summary()"""
+    item_count = serializers.IntegerField(read_only=True)
+    grand_total = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'order_number', 'user', 'first_name', 'last_name',
+            'email', 'phone', 'city', 'region', 'total_amount', 'grand_total',
+            'payment_method', 'payment_status', 'status', 'item_count',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class CreateOrderItemSerializer(serializers.Serializer):
+    """
+    A checkout line; price, name and SKU are always taken from the catalog,
+    so any client-supplied values for them are ignored
+    """
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
 class CreateOrderSerializer(serializers.ModelSerializer):
-    items = serializers.ListField(
-        child=serializers.DictField(),
-        write_only=True
-    )
+    items = CreateOrderItemSerializer(many=True, allow_empty=False, write_only=True)
 
     class Meta:
         model = Order
@@ -62,23 +88,57 @@ class CreateOrderSerializer(serializers.ModelSerializer):
             'shipping_address', 'city', 'region', 'postal_code', 
             'order_notes', 'total_amount', 'payment_method', 'items'
         ]
+        extra_kwargs = {
+            # Recomputed from catalog prices in create()
+            'total_amount': {'required': False},
+        }
 
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         
+        # Price every line from the catalog in one query
+        product_ids = {item_data['product_id'] for item_data in items_data}
+        products = Product.objects.filter(is_active=True).in_bulk(product_ids)
+        missing = sorted(product_ids - products.keys())
+        if missing:
+            raise serializers.ValidationError(
+                {'items': [f'Product {product_id} is not available' for product_id in missing]}
+            )
+        lines = [(products[item_data['product_id']], item_data['quantity']) for item_data in items_data]
+        
+        # Number the order up front so its stock ledger movements can reference it
+        validated_data['order_number'] = generate_order_number()
+        
+        # Reserve and decrement stock under row locks; rolls back the order on oversell
+        try:
+            allocations = reserve_stock(lines, reference=validated_data['order_number'])
+        except InsufficientStock as e:
+            raise serializers.ValidationError({'items': [str(e)]})
+        
         # Create order
+        validated_data['total_amount'] = sum(product.price * quantity for product, quantity in lines)
         order = Order.objects.create(**validated_data)
         
-        # Create order items
-        for item_data in items_data:
-            OrderItem.objects.create(
+        # Create order items in one INSERT
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                product_id=item_data['product_id'],
-                product_name=item_data['product_name'],
-                product_sku=item_data['product_sku'],
-                price=item_data['price'],
-                quantity=item_data['quantity']
+                product=product,
+                product_name=product.name,
+                product_sku=product.sku,
+                price=product.price,
+                quantity=quantity
             )
+            for product, quantity in lines
+        ])
+        
+        # Record which warehouses each line was reserved from
+        OrderItemAllocation.objects.bulk_create([
+            OrderItemAllocation(order_item=order_item, warehouse_id=warehouse_id, quantity=quantity)
+            for order_item, line_allocations in zip(order_items, allocations)
+            for warehouse_id, quantity in line_allocations
+        ])
         
         # Create initial status update
         OrderStatusUpdate.objects.create(
@@ -87,4 +147,7 @@ class CreateOrderSerializer(serializers.ModelSerializer):
             notes='Order placed successfully'
         )
         
+        # Queue confirmation emails in the same transaction as the order
+        enqueue_order_notifications(order)
+        
         return order
@@ -0,0 +1,150 @@
+"""
+Checkout, outbox and order endpoint tests, and their query budgets
+
+The fixture places a few orders with several items each, so per-order or
+per-item lazy loads show up as repeated statements.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.core.testing import CatalogTestCase
+from apps.orders.models import Order, OrderNotification
+from apps.orders.notifications import (
+    CLAIM_SECONDS, RateLimiter, claim_due_notifications, enqueue_order_notifications,
+    process_due_notifications
+)
+from apps.products.ledger import ledger_drift
+from apps.products.models import Product
+
+
+class OrderTestCase(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.order_payload = {
+            'first_name': 'Query', 'last_name': 'Budget', 'email': 'qbudget@example.com',
+            'phone': '0200000000', 'shipping_address': 'Budget Street', 'city': 'Accra',
+            'region': 'Greater Accra', 'payment_method': 'cod',
+            'items': [{'product_id': product.pk, 'quantity': 1} for product in cls.in_stock],
+        }
+        client = cls.client_class()
+        order_numbers = [
+            client.post(
+                '/api/orders/create/', cls.order_payload, content_type='application/json',
+                HTTP_AUTHORIZATION=f'Bearer {cls.token}',
+            ).json()['order_number']
+            for _ in range(3)
+        ]
+        # Checkout does not attach the account, so link them for the owner-only views
+        Order.objects.filter(order_number__in=order_numbers).update(user=cls.user)
+        cls.order_number = order_numbers[0]
+
+
+
+class CheckoutTests(OrderTestCase):
+    def test_checkout_decrements_stock_and_keeps_the_ledger_in_step(self):
+        before = dict(Product.objects.filter(pk__in=[p.pk for p in self.in_stock]).values_list('pk', 'stock_quantity'))
+
+        response = self.request('POST', '/api/orders/create/', True, self.order_payload)
+
+        self.assertEqual(response.status_code, 201, response.content)
+        for product in self.in_stock:
+            expected = before[product.pk] - 1 if product.track_stock else before[product.pk]
+            self.assertEqual(Product.objects.get(pk=product.pk).stock_quantity, expected)
+        self.assertEqual(ledger_drift(), [])
+
+    def test_checkout_rejects_an_oversell(self):
+        product = Product.objects.filter(track_stock=True, is_active=True, stock_quantity__gt=0).order_by('pk').first()
+        payload = {**self.order_payload, 'items': [{'product_id': product.pk, 'quantity': product.stock_quantity + 1}]}
+        orders = Order.objects.count()
+
+        response = self.request('POST', '/api/orders/create/', True, payload)
+
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(Order.objects.count(), orders)
+        self.assertEqual(Product.objects.get(pk=product.pk).stock_quantity, product.stock_quantity)
+
+
+class OrderCursorPaginationTests(OrderTestCase):
+    def test_next_links_walk_every_order_once(self):
+        # Order ids are UUIDs, so the cursor carries a UUID pk
+        pages, numbers = self.follow_pages('/api/orders/list/?pagination=cursor&page_size=1', auth=True, key='order_number')
+
+        expected = list(Order.objects.filter(user=self.user).order_by('-created_at', '-pk').values_list('order_number', flat=True))
+        self.assertEqual(numbers, expected)
+        self.assertEqual(pages, len(expected))
+
+    def test_summary_view_pages_the_same_way(self):
+        _, numbers = self.follow_pages(
+            '/api/orders/list/?pagination=cursor&page_size=2&view=summary', auth=True, key='order_number',
+        )
+        self.assertEqual(len(numbers), Order.objects.filter(user=self.user).count())
+
+
+class RecordingTransport:
+    name = 'test'
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    def send(self, *, recipient, subject, html):
+        if self.fail:
+            raise ConnectionError('mail server unavailable')
+        self.sent.append(recipient)
+        return f'msg-{len(self.sent)}'
+
+
+class OutboxTests(OrderTestCase):
+    def setUp(self):
+        OrderNotification.objects.all().delete()
+        self.notifications = enqueue_order_notifications(Order.objects.get(order_number=self.order_number))
+
+    def process(self, transport):
+        return process_due_notifications(transport=transport, rate_limiter=RateLimiter(0))
+
+    def test_claimed_notifications_are_hidden_from_other_workers(self):
+        claimed = claim_due_notifications(batch_size=10)
+
+        self.assertEqual({n.pk for n in claimed}, {n.pk for n in self.notifications})
+        self.assertEqual(claim_due_notifications(batch_size=10), [])
+        lease = OrderNotification.objects.get(pk=claimed[0].pk).next_attempt_at
+        self.assertGreater(lease, timezone.now() + timedelta(seconds=CLAIM_SECONDS - 60))
+
+    def test_delivers_and_records_each_notification(self):
+        transport = RecordingTransport()
+
+        self.assertEqual(self.process(transport), (2, 0))
+        self.assertEqual(len(transport.sent), 2)
+        sent = OrderNotification.objects.filter(status='sent')
+        self.assertEqual(sent.count(), 2)
+        self.assertTrue(all(n.provider_message_id and n.sent_at for n in sent))
+        self.assertEqual(self.process(transport), (0, 0))
+
+    def test_failed_sends_back_off_and_are_retried(self):
+        self.assertEqual(self.process(RecordingTransport(fail=True)), (0, 2))
+        pending = OrderNotification.objects.filter(status='pending', attempts=1)
+        self.assertEqual(pending.count(), 2)
+        self.assertTrue(all('mail server unavailable' in n.last_error for n in pending))
+        # Not due again until the backoff has passed
+        self.assertEqual(self.process(RecordingTransport()), (0, 0))
+
+        pending.update(next_attempt_at=timezone.now())
+        self.assertEqual(self.process(RecordingTransport()), (2, 0))
+        self.assertEqual(OrderNotification.objects.filter(status='sent', attempts=2).count(), 2)
+
+
+class OrderQueryBudgetTests(OrderTestCase):
+    def test_order_create(self):
+        # One conditional stock UPDATE per warehouse a line is allocated from, one ledger INSERT
+        self.assertEndpointBudget('POST', '/api/orders/create/', 14, max_repeats=3, auth=True, payload=self.order_payload)
+
+    def test_order_list(self):
+        self.assertEndpointBudget('GET', '/api/orders/list/', 4, auth=True)
+
+    def test_order_list_summary(self):
+        self.assertEndpointBudget('GET', '/api/orders/list/?view=summary', 2, auth=True)
+
+    def test_order_detail(self):
+        self.assertEndpointBudget('GET', f'/api/orders/{self.order_number}/', 4, auth=True)
@@ -0,0 +1,535 @@
+"""
+Bulk product import and export
+
+Rows are read from CSV or NDJSON as a stream and handled in batches: every
+row is validated with ProductImportSerializer (no queries), category/brand
+slugs and existing SKUs are resolved with one query each per batch, and
+the products are upserted by `sku` with `bulk_create(update_conflicts=True)`
+(one statement per distinct set of columns, normally one per batch). Only
+the columns present in a row are written, so a price list with just
+`sku,price` updates prices and leaves everything else alone. Specifications
+given for a row are synced by label (see services.sync_specifications), so
+unchanged specs are not rewritten; images are synced the same way by URL
+(services.sync_images); warehouse stock is upserted per warehouse and
+rolled up into `stock_quantity` (which is always the rollup for products
+stocked per warehouse, see stock.py).
+
+CSV layout: one column per product field, plus
+  images           image URLs separated by "|", the first one is primary
+  spec:<Label>     one column per specification (spec type inferred from the label)
+  stock:<CODE>     quantity held in the warehouse with that code
+NDJSON rows use the nested shape directly: "specifications" is a list of
+{label, value, spec_type}, "images" a list of {image, alt_text, is_primary}
+and "stock" a {warehouse code: quantity} object.
+
+Bulk writes skip model signals, so counters, caches and the search index are
+refreshed once at the end of an import.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework import serializers
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import bump_versions
+from .models import (
+    Brand, Category, Product, TechnicalSpecification, Warehouse, WarehouseStock
+)
+from .search import invalidate_index
+from .serializers import PriceStockUpdateSerializer, ProductImportSerializer
+from .services import reconcile_product_counts, sync_images, sync_specifications
+from .stock import rollup_product_stock, upsert_warehouse_stock
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+PRODUCT_FIELDS = [
+    'sku', 'name', 'slug', 'description', 'short_description', 'barcode', 'category', 'brand',
+    'price', 'compare_price', 'cost_price', 'condition', 'weight', 'dimensions', 'image_url',
+    'track_stock', 'stock_quantity', 'low_stock_threshold',
+    'is_active', 'is_featured', 'is_digital', 'meta_title', 'meta_description',
+]
+REQUIRED_FOR_NEW = ['name', 'description', 'category', 'brand', 'price']
+NULLABLE_FIELDS = {'barcode', 'compare_price', 'cost_price', 'weight', 'image_url'}
+SPEC_TYPES = {key for key, _ in TechnicalSpecification.SPEC_TYPES}
+# Identity columns are never rewritten once a product exists
+NOT_UPDATED = {'sku', 'slug'}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _text(stream):
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def read_csv(stream):
+    """Yield (line number, row dict) from a CSV file in the layout described above"""
+    reader = csv.DictReader(_text(stream))
+    for row in reader:
+        item, specs, stock, has_specs, has_stock = {}, [], {}, False, False
+        for column, value in row.items():
+            if column is None:
+                continue
+            column, value = column.strip(), (value or '').strip()
+            if column.startswith('spec:'):
+                has_specs = True
+                label = column[5:].strip()
+                if value:
+                    spec_type = label.lower() if label.lower() in SPEC_TYPES else 'other'
+                    specs.append({'label': label, 'value': value, 'spec_type': spec_type})
+            elif column.startswith('stock:'):
+                has_stock = True
+                if value:
+                    stock[column[6:].strip()] = value
+            elif column == 'images':
+                item['images'] = [
+                    {'image': url.strip(), 'is_primary': position == 0}
+                    for position, url in enumerate(value.split('|')) if url.strip()
+                ]
+            elif column in PRODUCT_FIELDS:
+                if value:
+                    item[column] = value
+                elif column in NULLABLE_FIELDS:
+                    item[column] = None
+                elif column in ('short_description', 'dimensions', 'meta_title', 'meta_description'):
+                    item[column] = ''
+        if has_specs:
+            item['specifications'] = specs
+        if has_stock:
+            item['stock'] = stock
+        yield reader.line_num, item
+
+
+def read_ndjson(stream):
+    """Yield (line number, row dict) from an NDJSON file; unparseable lines become errors"""
+    for line_number, line in enumerate(_text(stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            item = {'__error__': f'Invalid JSON: {e}'}
+        if not isinstance(item, dict):
+            item = {'__error__': 'Each line must be a JSON object'}
+        yield line_number, item
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def count_lines(upload):
+    """Newlines in an uploaded file, read in chunks; an upper bound on its rows"""
+    lines = sum(chunk.count(b'\n') for chunk in upload.chunks())
+    upload.seek(0)
+    return lines
+
+
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, sku, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'sku': sku, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+class ProductImporter:
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, log=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.log = log or (lambda message: None)
+        self.result = ImportResult()
+        self.warehouses = dict(Warehouse.objects.values_list('code', 'pk'))
+        # One bound serializer validates every row; building one per row
+        # deep-copies its (nested) fields each time and dominates the import
+        self.serializer = ProductImportSerializer(partial=True)
+
+    def run(self, rows):
+        """Import (line, row) pairs; returns the ImportResult"""
+        processed = 0
+        for batch in batched(rows, self.batch_size):
+            self.import_batch(batch)
+            processed += len(batch)
+            self.log(f'Processed {processed} rows ({self.result.failed} failed)')
+
+        if not self.dry_run and (self.result.created or self.result.updated):
+            reconcile_product_counts()
+            bump_versions('products', 'categories', 'brands')
+            invalidate_index()
+        return self.result
+
+    # Validation -------------------------------------------------------------
+
+    def validate_batch(self, batch):
+        """Return [(line, validated row)] for rows that pass, recording errors for the rest"""
+        candidates = []
+        for line, item in batch:
+            if '__error__' in item:
+                self.result.add_error(line, None, {'row': [item['__error__']]})
+                continue
+            try:
+                data = dict(self.serializer.run_validation(item))
+            except serializers.ValidationError as e:
+                self.result.add_error(line, item.get('sku'), e.detail)
+                continue
+            if not data.get('sku'):
+                self.result.add_error(line, None, {'sku': ['This field is required.']})
+                continue
+            candidates.append((line, data))
+
+        skus = [data['sku'] for _, data in candidates]
+        existing = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'pk'))
+        categories = dict(Category.objects.filter(
+            slug__in={data['category'] for _, data in candidates if 'category' in data}
+        ).values_list('slug', 'pk'))
+        brands = dict(Brand.objects.filter(
+            slug__in={data['brand'] for _, data in candidates if 'brand' in data}
+        ).values_list('slug', 'pk'))
+
+        valid, seen = [], set()
+        for line, data in candidates:
+            sku = data['sku']
+            errors = {}
+            if sku in seen:
+                errors['sku'] = ['Duplicate SKU in this batch.']
+            if sku not in existing:
+                for field in REQUIRED_FOR_NEW:
+                    if field not in data:
+                        errors[field] = ['This field is required for new products.']
+            if 'category' in data and data['category'] not in categories:
+                errors['category'] = [f"Unknown category '{data['category']}'."]
+            if 'brand' in data and data['brand'] not in brands:
+                errors['brand'] = [f"Unknown brand '{data['brand']}'."]
+            unknown = [code for code in data.get('stock', {}) if code not in self.warehouses]
+            if unknown:
+                errors['stock'] = [f"Unknown warehouse code(s): {', '.join(unknown)}."]
+            if errors:
+                self.result.add_error(line, sku, errors)
+                continue
+
+            seen.add(sku)
+            if 'category' in data:
+                data['category_id'] = categories[data.pop('category')]
+            if 'brand' in data:
+                data['brand_id'] = brands[data.pop('brand')]
+            data['_pk'] = existing.get(sku)
+            valid.append((line, data))
+        return valid
+
+    # Writing --------------------------------------------------------------
+
+    def import_batch(self, batch):
+        valid = self.validate_batch(batch)
+        if not valid:
+            return
+        try:
+            with transaction.atomic():
+                self.write(valid)
+                if self.dry_run:
+                    transaction.set_rollback(True)
+        except IntegrityError:
+            # Something in the batch clashes (usually a slug); retry row by row
+            # so only the offending rows are reported
+            for line, data in valid:
+                try:
+                    with transaction.atomic():
+                        self.write([(line, data)])
+                        if self.dry_run:
+                            transaction.set_rollback(True)
+                except IntegrityError as e:
+                    self.result.add_error(line, data['sku'], {'row': [str(e).splitlines()[0]]})
+
+    def write(self, rows):
+        now = timezone.now()
+        # Existing products are re-inserted with their current values for the
+        # columns a row leaves out, so NOT NULL holds and the upsert only
+        # touches the columns the row actually provides
+        current = Product.objects.in_bulk([data['_pk'] for _, data in rows if data['_pk'] is not None])
+
+        groups = {}
+        for _, data in rows:
+            fields = frozenset(key for key in data if key not in ('specifications', 'images', 'stock', '_pk'))
+            groups.setdefault(fields, []).append(data)
+
+        for fields, group in groups.items():
+            products = []
+            for data in group:
+                values = {key: data[key] for key in fields}
+                if data['_pk'] is None:
+                    values.setdefault('slug', slugify(f"{values['name']}-{values['sku']}")[:220])
+                    product = Product(created_at=now, **values)
+                else:
+                    product = current[data['_pk']]
+                    for key, value in values.items():
+                        setattr(product, key, value)
+                    product.pk = None
+                product.updated_at = now
+                products.append(product)
+            Product.objects.bulk_create(
+                products, update_conflicts=True, unique_fields=['sku'],
+                update_fields=sorted((fields | {'updated_at'}) - NOT_UPDATED),
+            )
+
+        ids = {data['sku']: data['_pk'] for _, data in rows if data['_pk'] is not None}
+        missing = [data['sku'] for _, data in rows if data['_pk'] is None]
+        if missing:
+            ids.update(Product.objects.filter(sku__in=missing).values_list('sku', 'pk'))
+        self.write_children(rows, ids)
+
+        created = len(missing)
+        self.result.created += created
+        self.result.updated += len(rows) - created
+
+    def write_children(self, rows, ids):
+        specs = {ids[data['sku']]: data['specifications'] for _, data in rows if 'specifications' in data}
+        if specs:
+            sync_specifications(specs)
+
+        images = {ids[data['sku']]: data['images'] for _, data in rows if 'images' in data}
+        if images:
+            sync_images(images)
+
+        stock = {
+            (ids[data['sku']], self.warehouses[code]): quantity
+            for _, data in rows
+            for code, quantity in data.get('stock', {}).items()
+        }
+        if stock:
+            upsert_warehouse_stock(stock, reference='import')
+        rolled_up = {product_id for product_id, _ in stock}
+        # A stock_quantity column cannot override products stocked per warehouse
+        overridden = [ids[data['sku']] for _, data in rows if 'stock_quantity' in data]
+        overridden = [pk for pk in overridden if pk not in rolled_up]
+        if overridden:
+            rolled_up.update(
+                WarehouseStock.objects.filter(product_id__in=overridden).values_list('product_id', flat=True)
+            )
+        if rolled_up:
+            rollup_product_stock(rolled_up)
+
+
+def import_products(stream, fmt='csv', **options):
+    """Import a CSV/NDJSON file object; returns the ImportResult"""
+    importer = ProductImporter(**options)
+    return importer.run(READERS[fmt](stream))
+
+
+# Price and stock sync ----------------------------------------------------
+
+MAX_SYNC_ITEMS = 5000
+SYNC_CHUNK_SIZE = 500
+PRICE_FIELDS = ['price', 'compare_price']
+
+
+class SyncError(Exception):
+    """A price/stock batch was rejected; `errors` lists the offending items"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f'{len(errors)} invalid item(s)')
+
+
+def _case(field, values):
+    """CASE expression setting `field` per pk, leaving other rows as they are"""
+    return Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+        default=F(field), output_field=Product._meta.get_field(field),
+    )
+
+
+def sync_prices_and_stock(items):
+    """
+    Apply a batch of ERP price and stock changes
+
+    Each item has a `sku` plus any of `price`, `compare_price`,
+    `stock_quantity` (products without warehouse rows) and
+    `warehouse_code` + `quantity`. Values are absolute, not increments, so
+    replaying a batch is harmless; later items for the same SKU win.
+
+    The batch is all or nothing: every item is validated and every SKU and
+    warehouse code resolved up front (one query each), and SyncError lists
+    all problems if anything is wrong. Otherwise, in one transaction, product
+    columns are set with one CASE UPDATE per chunk of products, warehouse rows
+    are upserted with a single statement and `stock_quantity` is rolled up for
+    the products whose warehouse stock changed. Cached responses are
+    invalidated once, after commit.
+
+    Returns:
+        Counts of products and warehouse rows written
+    """
+    if len(items) > MAX_SYNC_ITEMS:
+        raise SyncError([{'index': None, 'sku': None, 'errors': {
+            'items': [f'At most {MAX_SYNC_ITEMS} items per request, got {len(items)}.'],
+        }}])
+
+    serializer = PriceStockUpdateSerializer()
+    errors, valid = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, serializer.run_validation(item)))
+        except serializers.ValidationError as e:
+            errors.append({'index': index, 'sku': item.get('sku') if isinstance(item, dict) else None, 'errors': e.detail})
+
+    products = dict(Product.objects.filter(sku__in={data['sku'] for _, data in valid}).values_list('sku', 'pk'))
+    warehouses = dict(Warehouse.objects.filter(
+        code__in={data['warehouse_code'] for _, data in valid if 'warehouse_code' in data}
+    ).values_list('code', 'pk'))
+    stocked = set(WarehouseStock.objects.filter(product_id__in=products.values()).values_list('product_id', flat=True))
+
+    columns = defaultdict(dict)
+    stock = {}
+    for index, data in valid:
+        item_errors = {}
+        pk = products.get(data['sku'])
+        if pk is None:
+            item_errors['sku'] = [f"Unknown SKU '{data['sku']}'."]
+        if 'warehouse_code' in data and data['warehouse_code'] not in warehouses:
+            item_errors['warehouse_code'] = [f"Unknown warehouse code '{data['warehouse_code']}'."]
+        if 'stock_quantity' in data and pk in stocked:
+            item_errors['stock_quantity'] = [
+                'This product is stocked per warehouse; send warehouse_code and quantity instead.'
+            ]
+        if item_errors:
+            errors.append({'index': index, 'sku': data['sku'], 'errors': item_errors})
+            continue
+
+        for field in (*PRICE_FIELDS, 'stock_quantity'):
+            if field in data:
+                columns[field][pk] = data[field]
+        if 'warehouse_code' in data:
+            stock[(pk, warehouses[data['warehouse_code']])] = data['quantity']
+
+    if errors:
+        raise SyncError(sorted(errors, key=lambda error: error['index']))
+
+    product_ids = sorted({pk for values in columns.values() for pk in values})
+    with transaction.atomic():
+        now = timezone.now()
+        for chunk in batched(product_ids, SYNC_CHUNK_SIZE):
+            chunk = set(chunk)
+            Product.objects.filter(pk__in=chunk).update(
+                **{
+                    field: _case(field, {pk: value for pk, value in values.items() if pk in chunk})
+                    for field, values in columns.items()
+                    if chunk.intersection(values)
+                },
+                updated_at=now,
+            )
+        if stock:
+            upsert_warehouse_stock(stock, reference='erp-sync')
+            rollup_product_stock({pk for pk, _ in stock})
+        transaction.on_commit(lambda: bump_versions('products'))
+
+    return {'products': len(set(product_ids) | {pk for pk, _ in stock}), 'warehouse_rows': len(stock)}
+
+
+# Export -------------------------------------------------------------------
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def export_queryset(queryset=None):
+    queryset = Product.objects.all() if queryset is None else queryset
+    return queryset.select_related('category', 'brand').prefetch_related(
+        'specifications', 'images', 'warehouse_stock__warehouse',
+    ).order_by('pk')
+
+
+def product_row(product):
+    """Nested export row in the same shape import_products accepts"""
+    row = {field: getattr(product, field) for field in PRODUCT_FIELDS if field not in ('category', 'brand')}
+    row['category'] = product.category.slug
+    row['brand'] = product.brand.slug
+    row['specifications'] = [
+        {'label': spec.label, 'value': spec.value, 'spec_type': spec.spec_type}
+        for spec in product.specifications.all()
+    ]
+    row['images'] = [
+        {'image': image.image, 'alt_text': image.alt_text, 'is_primary': image.is_primary}
+        for image in product.images.all()
+    ]
+    row['stock'] = {stock.warehouse.code: stock.quantity for stock in product.warehouse_stock.all()}
+    return row
+
+
+def export_ndjson(queryset=None):
+    encoder = JSONEncoder(ensure_ascii=False)
+    for chunk in batched(export_queryset(queryset).iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+        yield ''.join(encoder.encode(product_row(product)) + '\n' for product in chunk)
+
+
+def export_csv(queryset=None):
+    """CSV export; spec and stock columns are discovered up front with two small queries"""
+    queryset = export_queryset(queryset)
+    labels = list(
+        TechnicalSpecification.objects.filter(product__in=queryset.values('pk'))
+        .order_by().values_list('label', flat=True).distinct()
+    )
+    labels.sort()
+    codes = list(Warehouse.objects.order_by('code').values_list('code', flat=True))
+    header = PRODUCT_FIELDS + ['images'] + [f'spec:{label}' for label in labels] + [f'stock:{code}' for code in codes]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for chunk in batched(queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+        for product in chunk:
+            row = product_row(product)
+            specs = {spec['label']: spec['value'] for spec in row['specifications']}
+            values = [_csv_value(row[field]) for field in PRODUCT_FIELDS]
+            values.append('|'.join(image['image'] for image in sorted(row['images'], key=lambda i: not i['is_primary'])))
+            values += [specs.get(label, '') for label in labels]
+            values += [row['stock'].get(code, '') for code in codes]
+            writer.writerow(values)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+EXPORTERS = {'csv': export_csv, 'ndjson': export_ndjson}
+CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
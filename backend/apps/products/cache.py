@@ -0,0 +1,73 @@
+"""
+Catalog cache versioning
+
+Each catalog section ('products', 'categories', 'brands', 'warehouses') has a
+version counter in the default cache. Cached catalog data is keyed by the
+versions it depends on, so bumping a section (from model signals or bulk
+jobs) invalidates every dependent entry at once without tracking keys. Writers
+bump on commit (transaction.on_commit) so a concurrent reader cannot cache
+the old rows under the new version.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+VERSION_KEY = 'catalog:version:{}'
+CATALOG_CACHE_TIMEOUT = 60 * 15
+
+
+def get_versions(*sections):
+    """Return the current version of each section, in order, in one cache round trip"""
+    keys = [VERSION_KEY.format(section) for section in sections]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            # Seed from the clock so an evicted counter never reuses an old version
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return versions
+
+
+def bump_versions(*sections):
+    """Invalidate everything cached against the given sections"""
+    for section in sections:
+        key = VERSION_KEY.format(section)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def versioned_key(prefix, sections, *parts):
+    """Build a cache key that changes whenever any of the sections is bumped"""
+    versions = '.'.join(str(version) for version in get_versions(*sections))
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'catalog:{prefix}:{versions}:{digest}'
+
+
+def cache_catalog_response(prefix, sections, timeout=CATALOG_CACHE_TIMEOUT):
+    """
+    Cache a catalog view's response data per query string until one of the
+    sections it depends on is bumped
+
+    Apply below @api_view so the wrapped view receives a DRF request.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = versioned_key(prefix, sections, request.get_full_path())
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout)
+            return response
+        return wrapper
+    return decorator
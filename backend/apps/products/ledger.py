@@ -0,0 +1,179 @@
+"""
+Stock movement ledger
+
+Every change to warehouse stock is also appended to StockMovement as a
+signed quantity: receipts, checkout sales, adjustments (imports, ERP sync,
+manual edits) and transfers between warehouses. Movements are only ever
+inserted, so recording one never waits on another writer's row lock.
+
+The stock level of a (product, warehouse) pair is its StockSnapshot plus the
+movements with a higher id than the snapshot's `last_movement_id`.
+compact_ledger() periodically folds older movements into the snapshots, so
+a read only ever sums the short tail recorded since the last compaction;
+the movements themselves are kept as history.
+
+WarehouseStock stays the row checkout reserves against (its conditional
+decrement is what prevents oversells); ledger_drift() checks that both
+agree.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import StockMovement, StockSnapshot, WarehouseStock
+
+COMPACT_BATCH_SIZE = 1000
+
+
+def record_movements(movements) -> list:
+    """Insert StockMovement instances in one statement, skipping zero quantities"""
+    movements = [movement for movement in movements if movement.quantity]
+    if not movements:
+        return []
+    return StockMovement.objects.bulk_create(movements)
+
+
+def movements_between(before, after, kind='adjustment', reference=''):
+    """
+    Movements that take stock levels from `before` to `after`
+
+    Both map (product_id, warehouse_id) to a quantity; pairs missing from
+    `before` start at 0. Returns unsaved StockMovement instances.
+    """
+    return [
+        StockMovement(
+            product_id=product_id, warehouse_id=warehouse_id, kind=kind,
+            quantity=quantity - before.get((product_id, warehouse_id), 0), reference=reference,
+        )
+        for (product_id, warehouse_id), quantity in after.items()
+        if quantity != before.get((product_id, warehouse_id), 0)
+    ]
+
+
+def _snapshot_position():
+    """Correlated subquery: the last movement id folded into the movement's pair snapshot"""
+    return Coalesce(
+        Subquery(
+            StockSnapshot.objects
+            .filter(product=OuterRef('product'), warehouse=OuterRef('warehouse'))
+            .values('last_movement_id')[:1]
+        ),
+        0,
+    )
+
+
+def stock_levels(product_ids) -> dict:
+    """
+    Ledger stock levels of the given products
+
+    Two queries regardless of history length: the snapshots, and one
+    aggregate over the movements recorded after them.
+
+    Returns:
+        {(product_id, warehouse_id): quantity}
+    """
+    levels = defaultdict(int)
+    for product_id, warehouse_id, quantity in StockSnapshot.objects.filter(
+        product_id__in=product_ids
+    ).values_list('product_id', 'warehouse_id', 'quantity'):
+        levels[(product_id, warehouse_id)] = quantity
+
+    pending = (
+        StockMovement.objects
+        .filter(product_id__in=product_ids, pk__gt=_snapshot_position())
+        .order_by().values('product_id', 'warehouse_id')
+        .annotate(total=Sum('quantity'))
+    )
+    for row in pending:
+        levels[(row['product_id'], row['warehouse_id'])] += row['total']
+    return dict(levels)
+
+
+def compact_ledger(older_than, batch_size=COMPACT_BATCH_SIZE, product_ids=None) -> dict:
+    """
+    Fold movements older than `older_than` (a timedelta) into the snapshots
+
+    Every snapshot ends up at the same position: the newest movement older
+    than the cutoff. Recent movements are left pending so transactions still
+    in flight when compaction starts cannot be skipped over; run it from a
+    single scheduled job, not concurrently with itself. `product_ids`
+    limits compaction to those products' pairs (their snapshots then sit at
+    their own position, which stock_levels() handles per pair).
+
+    Returns:
+        Counts of folded movements and written snapshots, and the new position
+    """
+    now = timezone.now()
+    movements, snapshots = StockMovement.objects.all(), StockSnapshot.objects.all()
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+        snapshots = snapshots.filter(product_id__in=product_ids)
+    position = movements.filter(created_at__lt=now - older_than).aggregate(last=Max('pk'))['last']
+    if position is None:
+        return {'movements': 0, 'snapshots': 0, 'position': None}
+
+    folded = written = 0
+    with transaction.atomic():
+        deltas = list(
+            movements
+            .filter(pk__lte=position, pk__gt=_snapshot_position())
+            .order_by().values_list('product_id', 'warehouse_id')
+            .annotate(total=Sum('quantity'), count=Count('pk'))
+        )
+        for start in range(0, len(deltas), batch_size):
+            batch = deltas[start:start + batch_size]
+            current = {
+                (snapshot.product_id, snapshot.warehouse_id): snapshot.quantity
+                for snapshot in StockSnapshot.objects.filter(
+                    product_id__in={product_id for product_id, *_ in batch}
+                ).only('product_id', 'warehouse_id', 'quantity')
+            }
+            StockSnapshot.objects.bulk_create(
+                [
+                    StockSnapshot(
+                        product_id=product_id, warehouse_id=warehouse_id,
+                        quantity=current.get((product_id, warehouse_id), 0) + total,
+                        last_movement_id=position, taken_at=now,
+                    )
+                    for product_id, warehouse_id, total, _ in batch
+                ],
+                update_conflicts=True, unique_fields=['product', 'warehouse'],
+                update_fields=['quantity', 'last_movement_id', 'taken_at'],
+            )
+            folded += sum(count for *_, count in batch)
+            written += len(batch)
+
+        # Pairs without movements in the range are already correct at the new position
+        snapshots.filter(last_movement_id__lt=position).update(last_movement_id=position, taken_at=now)
+
+    return {'movements': folded, 'snapshots': written, 'position': position}
+
+
+def ledger_drift(batch_size=COMPACT_BATCH_SIZE) -> list:
+    """
+    Pairs whose ledger level disagrees with WarehouseStock
+
+    Returns:
+        List of (product_id, warehouse_id, warehouse_quantity, ledger_quantity)
+    """
+    product_ids = sorted(
+        set(WarehouseStock.objects.values_list('product_id', flat=True))
+        | set(StockSnapshot.objects.values_list('product_id', flat=True))
+    )
+    drift = []
+    for start in range(0, len(product_ids), batch_size):
+        chunk = product_ids[start:start + batch_size]
+        ledger = stock_levels(chunk)
+        stock = {
+            (product_id, warehouse_id): quantity
+            for product_id, warehouse_id, quantity in WarehouseStock.objects.filter(
+                product_id__in=chunk
+            ).values_list('product_id', 'warehouse_id', 'quantity')
+        }
+        for pair in sorted(stock.keys() | ledger.keys()):
+            if stock.get(pair, 0) != ledger.get(pair, 0):
+                drift.append((*pair, stock.get(pair, 0), ledger.get(pair, 0)))
+    return drift
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.models import Product
+from apps.products.services import refresh_product_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized rating columns on products from approved reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(product_ids.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            updated += refresh_product_ratings(batch)
+            last_id = batch[-1]
+            self.stdout.write(f'Refreshed ratings for {updated} products...')
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {updated} products refreshed'))
@@ -0,0 +1,129 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from apps.products.models import Brand, Category, Product, ProductReview
+from apps.products.synthetic import CatalogGenerator
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Show EXPLAIN plans and timings for the catalog list queries with and without '
+        'the catalog indexes, on a synthetic catalog. Everything runs in one transaction '
+        'that is rolled back, but the index drops lock the tables while it runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000, help='Synthetic products to add (0 = use existing data)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--no-explain', action='store_true', help='Only print timings')
+        parser.add_argument('--force', action='store_true', help='Allow running with DEBUG off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Drops indexes inside a transaction; use --force to run against a non-DEBUG database')
+
+        self.options = options
+        try:
+            with transaction.atomic():
+                if options['products']:
+                    self.stdout.write(f"Seeding {options['products']} synthetic products...")
+                    self.seed(options['products'], options['seed'])
+                self.run_all()
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('Benchmark finished, synthetic data rolled back'))
+
+    def run_all(self):
+        indexes = [(Product, index) for index in Product._meta.indexes]
+        indexes += [(ProductReview, index) for index in ProductReview._meta.indexes]
+
+        # Raw DDL rather than a schema_editor context, which SQLite refuses
+        # to open inside a transaction
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model, index in indexes:
+                cursor.execute(str(index.remove_sql(model, editor)))
+        self.analyze()
+        before = self.run_queries('WITHOUT catalog indexes')
+
+        with connection.cursor() as cursor:
+            for model, index in indexes:
+                cursor.execute(str(index.create_sql(model, editor)))
+        self.analyze()
+        after = self.run_queries('WITH catalog indexes')
+
+        self.stdout.write('\nSummary (median ms)')
+        self.stdout.write(f"{'query':<28}{'before':>10}{'after':>10}{'speedup':>10}")
+        for name in before:
+            speedup = before[name] / after[name] if after[name] else float('inf')
+            self.stdout.write(f"{name:<28}{before[name]:>10.2f}{after[name]:>10.2f}{speedup:>9.1f}x")
+
+    def queries(self):
+        """Querysets shaped like ProductListView, featured_products, product_stats and reviews"""
+        active = Product.objects.filter(is_active=True)
+        category_id = Category.objects.values_list('pk', flat=True).first()
+        brand_id = Brand.objects.values_list('pk', flat=True).first()
+        product_id = ProductReview.objects.values_list('product_id', flat=True).first() or 0
+        return {
+            'list_newest': active.order_by('-created_at')[:12],
+            'list_category': active.filter(category_id=category_id).order_by('-created_at')[:12],
+            'list_brand': active.filter(brand_id=brand_id).order_by('-created_at')[:12],
+            'list_price_range': active.filter(price__gte=100, price__lte=150).order_by('price')[:12],
+            'list_in_stock': active.filter(Q(track_stock=False) | Q(stock_quantity__gt=0)).order_by('-created_at')[:12],
+            'list_top_rated': active.order_by('-rating_average')[:12],
+            'featured': active.filter(is_featured=True).order_by('-created_at')[:12],
+            'stats_out_of_stock': Product.objects.filter(track_stock=True, stock_quantity=0).order_by(),
+            'stats_low_stock': Product.objects.filter(
+                track_stock=True, stock_quantity__lte=F('low_stock_threshold'), stock_quantity__gt=0
+            ).order_by(),
+            'product_reviews': ProductReview.objects.filter(product_id=product_id, is_approved=True).order_by('-created_at')[:20],
+        }
+
+    def run_queries(self, label):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {label} ==='))
+        results = {}
+        for name, queryset in self.queries().items():
+            counting = name.startswith('stats_')
+            if not self.options['no_explain']:
+                self.stdout.write(self.style.MIGRATE_LABEL(f'\n-- {name}'))
+                self.stdout.write(queryset.explain())
+
+            timings = []
+            for _ in range(self.options['repeat']):
+                started = time.perf_counter()
+                if counting:
+                    queryset.count()
+                else:
+                    list(queryset.values_list('pk', flat=True))
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+            self.stdout.write(f'{name}: median {results[name]:.2f} ms over {len(timings)} runs')
+        return results
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE products_product; ANALYZE products_productreview')
+            else:
+                cursor.execute('ANALYZE')
+
+    def seed(self, count, seed):
+        generator = CatalogGenerator(seed=seed, prefix=f'bench{seed}', batch_size=5000)
+        generator.create_products(
+            count,
+            categories=generator.create_categories(50),
+            brands=generator.create_brands(500),
+            warehouses=[],
+            user_ids=generator.create_users(200),
+            images_per_product=0, specs_per_product=0, reviews_per_product=0.6,
+        )
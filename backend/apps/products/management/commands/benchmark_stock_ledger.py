@@ -0,0 +1,163 @@
+import statistics
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+
+from apps.products.ledger import compact_ledger, record_movements, stock_levels
+from apps.products.models import Brand, Category, Product, StockMovement, Warehouse, WarehouseStock
+from apps.products.stock import receive_stock
+
+BENCH_SKU = 'LEDGER-BENCH-SKU'
+BENCH_WAREHOUSE = 'LEDGERBNCH'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure write throughput of concurrent single-unit sales of one SKU: a conditional UPDATE '
+        'of the shared warehouse stock row versus an INSERT into the stock ledger. Use a PostgreSQL '
+        'database; SQLite serializes all writers, so both modes show the same single-writer ceiling. '
+        'Writes a benchmark product, warehouse and movements to the configured database: do not point '
+        'it at production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--sales', type=int, default=2000, help='Sales per mode')
+        parser.add_argument('--modes', default='hot-row,ledger', help='Comma separated: hot-row, ledger')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark product and its movements')
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = set(modes) - {'hot-row', 'ledger'}
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+        self.stdout.write(self.style.WARNING(
+            f"Writing benchmark rows to database '{connection.settings_dict['NAME']}' on {connection.vendor}"
+        ))
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f'Running on {connection.vendor}: writers are serialized, expect no difference between modes'
+            ))
+
+        product, warehouse = self._setup(options['sales'] * len(modes))
+        row = WarehouseStock.objects.get(product=product, warehouse=warehouse)
+        sell = {
+            'hot-row': lambda: WarehouseStock.objects.filter(
+                pk=row.pk, quantity__gte=1
+            ).update(quantity=F('quantity') - 1),
+            'ledger': lambda: record_movements([StockMovement(
+                product=product, warehouse=warehouse, kind='sale', quantity=-1, reference='benchmark',
+            )]),
+        }
+
+        try:
+            results = {mode: self._run(sell[mode], options['threads'], options['sales']) for mode in modes}
+
+            self.stdout.write(f"\n{options['sales']} single-unit sales of one SKU from {options['threads']} threads")
+            self.stdout.write(f"{'mode':<10}{'sales/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+            for mode, result in results.items():
+                self.stdout.write(
+                    f"{mode:<10}{result['throughput']:>10.0f}{result['p50']:>10.2f}{result['p99']:>10.2f}{result['errors']:>8}"
+                )
+
+            units = options['sales'] * len(modes)
+            sold = {mode: result['sold'] for mode, result in results.items()}
+            self._report_reads(product, expected_level=units - sold.get('ledger', 0))
+            stock = WarehouseStock.objects.get(pk=row.pk).quantity
+            if stock != units - sold.get('hot-row', 0):
+                raise CommandError(f"Warehouse row is {stock}, expected {units - sold.get('hot-row', 0)}")
+        finally:
+            if not options['keep']:
+                product.delete()
+                warehouse.delete()
+                Category.objects.filter(slug='ledger-bench').delete()
+                Brand.objects.filter(slug='ledger-bench').delete()
+
+    def _run(self, sell, threads, sales):
+        latencies, errors = [], []
+        lock = threading.Lock()
+        remaining = [sales]
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if not remaining[0]:
+                            return
+                        remaining[0] -= 1
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            sell()
+                    except Exception as e:
+                        with lock:
+                            errors.append(type(e).__name__)
+                        continue
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'throughput': len(latencies) / elapsed if elapsed else 0,
+            'p50': statistics.median(latencies) if latencies else 0,
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0,
+            'errors': len(errors),
+            'sold': len(latencies),
+        }
+
+    def _report_reads(self, product, expected_level):
+        """Ledger read cost before and after compacting the benchmark's movements"""
+        def timed_read():
+            timings = []
+            for _ in range(20):
+                started = time.perf_counter()
+                levels = stock_levels([product.pk])
+                timings.append((time.perf_counter() - started) * 1000)
+            return sum(levels.values()), statistics.median(timings)
+
+        pending = StockMovement.objects.filter(product=product).count()
+        level, before = timed_read()
+        # Only the benchmark product's pair: other products may have sales in flight
+        folded = compact_ledger(timedelta(0), product_ids=[product.pk])
+        compacted_level, after = timed_read()
+
+        self.stdout.write(
+            f'\nLedger read: {before:.2f} ms with {pending} pending movements, '
+            f"{after:.2f} ms after folding {folded['movements']} into snapshots"
+        )
+        if not level == compacted_level == expected_level:
+            raise CommandError(
+                f'Ledger level {level} (after compaction {compacted_level}), expected {expected_level}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'No sales lost: ledger level {level}'))
+
+    def _setup(self, units):
+        category, _ = Category.objects.get_or_create(slug='ledger-bench', defaults={'name': 'Ledger Benchmark'})
+        brand, _ = Brand.objects.get_or_create(slug='ledger-bench', defaults={'name': 'Ledger Benchmark'})
+        Product.objects.filter(sku=BENCH_SKU).delete()
+        product = Product.objects.create(
+            sku=BENCH_SKU, name='Ledger Benchmark Product', slug='ledger-bench-product',
+            description='Created by benchmark_stock_ledger', category=category, brand=brand,
+            price=Decimal('10.00'), track_stock=True, is_active=True,
+        )
+        warehouse, _ = Warehouse.objects.get_or_create(
+            code=BENCH_WAREHOUSE, defaults={'name': 'Ledger Benchmark', 'address': 'Benchmark', 'phone': '0'},
+        )
+        receive_stock(product, warehouse, units, reference='benchmark opening stock')
+        return product, warehouse
@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.ledger import COMPACT_BATCH_SIZE, compact_ledger, ledger_drift
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold stock movements older than --older-than minutes into the per-warehouse snapshots, '
+        'so ledger reads only sum the recent tail. Movements are kept as history.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=60,
+            help='Minutes; newer movements stay pending so in-flight transactions are never skipped',
+        )
+        parser.add_argument('--batch-size', type=int, default=COMPACT_BATCH_SIZE, help='Snapshots per upsert')
+        parser.add_argument('--verify', action='store_true', help='Compare ledger levels with warehouse stock afterwards')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = compact_ledger(timedelta(minutes=options['older_than']), batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        if result['position'] is None:
+            self.stdout.write(f"No movements older than {options['older_than']} minutes")
+        else:
+            self.stdout.write(
+                f"Folded {result['movements']} movements into {result['snapshots']} snapshots "
+                f"(up to movement #{result['position']}) in {elapsed:.2f}s"
+            )
+
+        if options['verify']:
+            drift = ledger_drift()
+            for product_id, warehouse_id, stock, ledger in drift[:20]:
+                self.stdout.write(
+                    f'  product {product_id} @ warehouse {warehouse_id}: warehouse stock {stock}, ledger {ledger}'
+                )
+            if drift:
+                raise CommandError(f'{len(drift)} product/warehouse pairs disagree with the ledger')
+            self.stdout.write(self.style.SUCCESS('Ledger matches warehouse stock'))
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from apps.products.bulk import EXPORTERS
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Stream every product (with specs, images and warehouse stock) as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORTERS), default='csv')
+        parser.add_argument('--output', help='File to write; defaults to stdout')
+        parser.add_argument('--active-only', action='store_true')
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.all()
+        if options['active_only']:
+            queryset = queryset.filter(is_active=True)
+
+        chunks = EXPORTERS[options['format']](queryset)
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Exported to {options['output']}"))
+        else:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
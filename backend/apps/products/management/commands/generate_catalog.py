@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.products.models import Product
+from apps.products.synthetic import CatalogGenerator, delete_generated
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic catalog (and orders) for load and benchmark testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10_000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--brands', type=int, default=500)
+        parser.add_argument('--warehouses', type=int, default=3)
+        parser.add_argument('--users', type=int, default=1000, help='Customers used for reviews and orders')
+        parser.add_argument('--images', type=int, default=2, help='Images per product')
+        parser.add_argument('--specs', type=int, default=3, help='Specifications per product')
+        parser.add_argument('--reviews', type=float, default=1.0, help='Average reviews per product')
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='gen', help='Slug/SKU prefix identifying generated rows')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--flush', action='store_true', help='Delete rows from a previous run with this prefix first')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix'].lower()
+        if options['flush']:
+            self.stdout.write(f"Deleting previously generated '{prefix}' data...")
+            delete_generated(prefix)
+        elif Product.objects.filter(slug__startswith=f'{prefix}-product-').exists():
+            raise CommandError(f"Generated '{prefix}' data already exists; pass --flush or a different --prefix")
+
+        generator = CatalogGenerator(
+            seed=options['seed'], prefix=prefix, batch_size=options['batch_size'], log=self.stdout.write,
+        )
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            categories = generator.create_categories(options['categories'])
+            brands = generator.create_brands(options['brands'])
+            warehouses = generator.create_warehouses(options['warehouses'])
+        user_ids = generator.create_users(options['users'])
+
+        # Each product/order batch commits on its own so memory and locks stay bounded
+        generator.create_products(
+            options['products'],
+            categories=categories, brands=brands, warehouses=warehouses, user_ids=user_ids,
+            images_per_product=options['images'], specs_per_product=options['specs'],
+            reviews_per_product=options['reviews'],
+        )
+        generator.create_orders(options['orders'], user_ids=user_ids)
+        generator.finish()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Synthetic catalog generated in {elapsed:.1f}s'))
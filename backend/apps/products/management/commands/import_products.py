@@ -0,0 +1,43 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.bulk import DEFAULT_BATCH_SIZE, READERS, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = 'Import or update products by SKU from a CSV or NDJSON file (see apps/products/bulk.py for the layout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(READERS), help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate and write, then roll each batch back')
+        parser.add_argument('--errors', help='Write per-row errors to this JSON file')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = import_products(
+                    stream, fmt, batch_size=options['batch_size'], dry_run=options['dry_run'],
+                    log=self.stdout.write,
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        summary = result.as_dict()
+        if options['errors']:
+            with open(options['errors'], 'w') as f:
+                json.dump(summary['errors'], f, indent=2, default=str)
+        else:
+            for error in summary['errors'][:20]:
+                self.stdout.write(self.style.WARNING(f"line {error['line']} ({error['sku']}): {error['errors']}"))
+
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{summary['created']} created, {summary['updated']} updated, "
+            f"{summary['failed']} failed in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.cache import bump_versions
+from apps.products.services import reconcile_product_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount active products per category (with subcategory totals) and per brand'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_product_counts()
+        if fixed['categories'] or fixed['brands']:
+            bump_versions('categories', 'brands')
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: corrected {fixed['categories']} categories and {fixed['brands']} brands"
+        ))
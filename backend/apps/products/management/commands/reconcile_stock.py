@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.stock import reconcile_stock
+
+
+class Command(BaseCommand):
+    help = (
+        'Find products whose stock_quantity disagrees with their warehouse stock '
+        '(sum over active warehouses) and roll them up again'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Products per UPDATE')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drift')
+        parser.add_argument('--show', type=int, default=20, help='How many drifted products to list')
+
+    def handle(self, *args, **options):
+        drifted = reconcile_stock(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        for pk, sku, stock_quantity, warehouse_total in drifted[:options['show']]:
+            self.stdout.write(f'  {sku} (#{pk}): stock_quantity {stock_quantity}, warehouses {warehouse_total}')
+        if len(drifted) > options['show']:
+            self.stdout.write(f'  ... and {len(drifted) - options["show"]} more')
+
+        verb = 'would correct' if options['dry_run'] else 'corrected'
+        self.stdout.write(self.style.SUCCESS(f'Done: {verb} {len(drifted)} products'))
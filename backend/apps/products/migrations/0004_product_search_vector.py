@@ -0,0 +1,79 @@
+# Generated by Django 5.0.7 on 2026-10-17 15:40
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Weights: name (A) > sku (B) > brand name (C) > descriptions (D)
+CREATE_SEARCH_SQL = """
+CREATE OR REPLACE FUNCTION products_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.sku, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(
+            (SELECT name FROM products_brand WHERE id = NEW.brand_id), ''
+        )), 'C') ||
+        setweight(to_tsvector('english',
+            coalesce(NEW.short_description, '') || ' ' || coalesce(NEW.description, '')
+        ), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, sku, brand_id, short_description, description
+    ON products_product
+    FOR EACH ROW EXECUTE FUNCTION products_product_search_vector_update();
+
+CREATE OR REPLACE FUNCTION products_brand_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    IF NEW.name IS DISTINCT FROM OLD.name THEN
+        UPDATE products_product SET name = name WHERE brand_id = NEW.id;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_brand_search_vector_trigger
+    AFTER UPDATE OF name ON products_brand
+    FOR EACH ROW EXECUTE FUNCTION products_brand_search_vector_update();
+
+UPDATE products_product SET name = name;
+
+CREATE INDEX products_product_search_vector_gin ON products_product USING gin (search_vector);
+"""
+
+DROP_SEARCH_SQL = """
+DROP INDEX IF EXISTS products_product_search_vector_gin;
+DROP TRIGGER IF EXISTS products_brand_search_vector_trigger ON products_brand;
+DROP FUNCTION IF EXISTS products_brand_search_vector_update();
+DROP TRIGGER IF EXISTS products_product_search_vector_trigger ON products_product;
+DROP FUNCTION IF EXISTS products_product_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    # Other backends use the in-process index in apps/products/search.py
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_SQL)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
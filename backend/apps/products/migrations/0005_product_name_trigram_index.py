@@ -0,0 +1,35 @@
+# Generated by Django 5.0.7 on 2026-10-17 15:52
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Matches the UPPER(name::text) LIKE UPPER(...) that name__icontains compiles to
+CREATE_INDEX_SQL = """
+CREATE INDEX products_product_name_trgm
+    ON products_product USING gin ((UPPER(name::text)) gin_trgm_ops)
+    WHERE is_active;
+"""
+
+DROP_INDEX_SQL = "DROP INDEX IF EXISTS products_product_name_trgm;"
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEX_SQL)
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
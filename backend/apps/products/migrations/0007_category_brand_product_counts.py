@@ -0,0 +1,55 @@
+# Generated by Django 5.0.7 on 2026-10-17 15:56
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counts(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Brand = apps.get_model('products', 'Brand')
+    Product = apps.get_model('products', 'Product')
+
+    active = Product.objects.filter(is_active=True).order_by()
+    for brand_id, count in active.values('brand_id').annotate(n=Count('pk')).values_list('brand_id', 'n'):
+        Brand.objects.filter(pk=brand_id).update(active_product_count=count)
+
+    counts = dict(active.values('category_id').annotate(n=Count('pk')).values_list('category_id', 'n'))
+    parents = dict(Category.objects.values_list('pk', 'parent_id'))
+    totals = {}
+    for category_id, count in counts.items():
+        current, seen = category_id, set()
+        while current is not None and current not in seen:
+            seen.add(current)
+            totals[current] = totals.get(current, 0) + count
+            current = parents.get(current)
+    for category_id in parents:
+        Category.objects.filter(pk=category_id).update(
+            active_product_count=counts.get(category_id, 0),
+            total_product_count=totals.get(category_id, 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_catalog_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='active_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='active_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='total_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
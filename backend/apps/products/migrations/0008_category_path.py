@@ -0,0 +1,45 @@
+# Generated by Django 5.0.7 on 2026-10-17 15:58
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    parents = dict(Category.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def path_of(pk, seen=()):
+        if pk not in paths:
+            parent = parents.get(pk)
+            prefix = path_of(parent, seen + (pk,)) if parent is not None and parent not in seen else ''
+            paths[pk] = f'{prefix}{pk}/'
+        return paths[pk]
+
+    for pk in parents:
+        path = path_of(pk)
+        Category.objects.filter(pk=pk).update(path=path, depth=path.count('/') - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_category_brand_product_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.7 on 2026-10-17 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def open_ledger(apps, schema_editor):
+    """Current warehouse stock becomes the opening snapshot (before movement #1)"""
+    WarehouseStock = apps.get_model('products', 'WarehouseStock')
+    StockSnapshot = apps.get_model('products', 'StockSnapshot')
+    now = timezone.now()
+    StockSnapshot.objects.bulk_create(
+        (
+            StockSnapshot(product_id=product_id, warehouse_id=warehouse_id, quantity=quantity, taken_at=now)
+            for product_id, warehouse_id, quantity in
+            WarehouseStock.objects.values_list('product_id', 'warehouse_id', 'quantity').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_category_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('sale', 'Sale'), ('adjustment', 'Adjustment'), ('transfer', 'Transfer')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.warehouse')),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['product', 'warehouse', 'id'], name='movement_pair_idx'), models.Index(fields=['created_at'], name='movement_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('taken_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='products.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='products.warehouse')),
+            ],
+            options={
+                'unique_together': {('product', 'warehouse')},
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-17 18:05
+
+from django.db import migrations
+
+# Matches the UPPER(sku::text) LIKE UPPER('...%') that sku__istartswith compiles to
+CREATE_INDEX_SQL = """
+CREATE INDEX products_product_sku_upper_pattern
+    ON products_product ((UPPER(sku::text)) text_pattern_ops);
+"""
+
+DROP_INDEX_SQL = "DROP INDEX IF EXISTS products_product_sku_upper_pattern;"
+
+
+def create_sku_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEX_SQL)
+
+
+def drop_sku_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sku_index, drop_sku_index),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
 from apps.accounts.models import UserRole
 
 User = get_user_model()
@@ -10,17 +14,63 @@ class Category(models.Model):
     description = models.TextField(blank=True)
     image = models.URLField(blank=True, null=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True)
+    # Materialized path of ancestor ids ("3/17/42/"), so a whole subtree is
+    # one `path LIKE '3/17/%'` lookup; maintained by save()
+    path = models.CharField(max_length=255, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(editable=False, default=0)
     is_active = models.BooleanField(default=True)
+    # Maintained by signals (see services.adjust_product_counts); repair with
+    # `manage.py reconcile_product_counts`
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
+    total_product_count = models.PositiveIntegerField(default=0, editable=False)  # incl. subcategories
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ['name']
+        indexes = [
+            # varchar_pattern_ops lets PostgreSQL use the index for prefix LIKE
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.pk and self.parent_id and self.path:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if parent_path.startswith(self.path):
+                raise ValidationError({'parent': 'A category cannot be moved below itself.'})
+
+    def save(self, *args, **kwargs):
+        old_path = self.path
+        parent_path = ''
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+        if self.pk and parent_path.startswith(old_path or '\0'):
+            raise ValueError('A category cannot be moved below itself')
+
+        super().save(*args, **kwargs)
+
+        new_path = f'{parent_path}{self.pk}/'
+        if new_path == old_path:
+            return
+        depth = new_path.count('/') - 1
+        if old_path:
+            # Re-root the whole subtree (this row included) in one statement
+            Category.objects.filter(path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=models.F('depth') + (depth - self.depth),
+            )
+        else:
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=depth)
+        self.path, self.depth = new_path, depth
+
+    def get_descendants(self, include_self=True):
+        queryset = Category.objects.filter(path__startswith=self.path)
+        return queryset if include_self else queryset.exclude(pk=self.pk)
+
 class Brand(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=120, unique=True)
@@ -28,6 +78,7 @@ class Brand(models.Model):
     logo = models.URLField(blank=True, null=True)
     website = models.URLField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -52,6 +103,28 @@ class Warehouse(models.Model):
     def __str__(self):
         return f"{self.name} ({self.code})"
 
+class ProductQuerySet(models.QuerySet):
+    def with_list_relations(self):
+        """Load everything ProductListSerializer reads in a fixed number of queries"""
+        return self.select_related('category', 'brand').prefetch_related(
+            models.Prefetch(
+                'images',
+                # Primary image first, then the regular image ordering, so the
+                # serializer can take the head of the list as the display image
+                queryset=ProductImage.objects.order_by('-is_primary', 'sort_order', 'created_at'),
+                to_attr='listing_images',
+            )
+        )
+
+    def with_detail_relations(self):
+        """Load everything ProductDetailSerializer reads in a fixed number of queries"""
+        return self.select_related('category', 'brand').prefetch_related(
+            'images',
+            'specifications',
+            models.Prefetch('warehouse_stock', queryset=WarehouseStock.objects.select_related('warehouse')),
+            models.Prefetch('reviews', queryset=ProductReview.objects.select_related('user')),
+        )
+
 class Product(models.Model):
     CONDITION_CHOICES = [
         ('new', 'New'),
@@ -95,12 +168,52 @@ class Product(models.Model):
     meta_title = models.CharField(max_length=200, blank=True)
     meta_description = models.CharField(max_length=300, blank=True)
     
+    # Review aggregates (approved reviews only, maintained by signals.py)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    
+    # Weighted full-text document, maintained by a Postgres trigger (see search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        # Matched to ProductListView, featured_products and product_stats;
+        # public reads always filter is_active=True, so most are partial
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(is_active=True),
+                name='product_active_recent_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at'], condition=models.Q(is_active=True),
+                name='product_active_category_idx',
+            ),
+            models.Index(
+                fields=['brand', '-created_at'], condition=models.Q(is_active=True),
+                name='product_active_brand_idx',
+            ),
+            models.Index(
+                fields=['price'], condition=models.Q(is_active=True),
+                name='product_active_price_idx',
+            ),
+            models.Index(
+                fields=['-rating_average'], condition=models.Q(is_active=True),
+                name='product_active_rating_idx',
+            ),
+            models.Index(
+                fields=['-created_at'], condition=models.Q(is_active=True, is_featured=True),
+                name='product_featured_recent_idx',
+            ),
+            # In-stock filter and the out-of-stock / low-stock counts
+            models.Index(fields=['track_stock', 'stock_quantity'], name='product_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
@@ -113,6 +226,12 @@ class Product(models.Model):
     def is_low_stock(self):
         return self.track_stock and self.stock_quantity <= self.low_stock_threshold
 
+    @property
+    def average_rating(self):
+        if self.rating_count:
+            return round(self.rating_sum / self.rating_count, 1)
+        return 0
+
     @property
     def discount_percentage(self):
         if self.compare_price and self.compare_price > self.price:
@@ -170,6 +289,58 @@ class WarehouseStock(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.warehouse.name}: {self.quantity}"
 
+    def save(self, *args, **kwargs):
+        # The pre_save ledger signal locks the current row; keep it locked until the write
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class StockMovement(models.Model):
+    """
+    One change to a product's stock in one warehouse (append-only)
+
+    Quantities are signed: receipts and transfers in are positive, sales and
+    transfers out negative. Rows are never updated; the current level is the
+    pair's StockSnapshot plus the movements recorded after it (see ledger.py).
+    """
+    KIND_CHOICES = [
+        ('receipt', 'Receipt'),
+        ('sale', 'Sale'),
+        ('adjustment', 'Adjustment'),
+        ('transfer', 'Transfer'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    reference = models.CharField(max_length=100, blank=True)  # Order number, transfer id, import source...
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            # Pending movements of a pair are read as "id > snapshot.last_movement_id"
+            models.Index(fields=['product', 'warehouse', 'id'], name='movement_pair_idx'),
+            models.Index(fields=['created_at'], name='movement_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} {self.product.sku} @ {self.warehouse.code}"
+
+class StockSnapshot(models.Model):
+    """Stock level of a product in a warehouse after folding in movements up to last_movement_id"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='stock_snapshots')
+    quantity = models.IntegerField(default=0)
+    last_movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['product', 'warehouse']
+
+    def __str__(self):
+        return f"{self.product.sku} @ {self.warehouse.code}: {self.quantity} (to #{self.last_movement_id})"
+
 class ProductReview(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -184,6 +355,11 @@ class ProductReview(models.Model):
     class Meta:
         unique_together = ['product', 'user']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['product', 'is_approved', '-created_at'], name='review_product_approved_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Review for {self.product.name} by {self.user.username}"
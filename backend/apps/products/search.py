@@ -0,0 +1,162 @@
+"""
+Product catalog search
+
+On PostgreSQL the `search` query parameter is answered from the weighted
+`Product.search_vector` column (GIN indexed, kept current by a trigger, see
+migration 0004) and ranked by relevance. Other backends (SQLite in local
+development) use an in-process inverted index with the same weights.
+"""
+import operator
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from functools import reduce
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+# Same defaults Postgres uses for the A/B/C/D weights
+FIELD_WEIGHTS = {
+    'name': 1.0,
+    'sku': 0.4,
+    'brand__name': 0.2,
+    'short_description': 0.1,
+    'description': 0.1,
+}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_RE.findall(text or '')]
+
+
+class InvertedIndex:
+    """Token -> {product_id: weight} map with prefix lookups over sorted tokens"""
+
+    def __init__(self, rows):
+        postings = defaultdict(dict)
+        for row in rows:
+            product_id = row['id']
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(row[field]):
+                    if postings[token].get(product_id, 0) < weight:
+                        postings[token][product_id] = weight
+        self.postings = dict(postings)
+        self.tokens = sorted(self.postings)
+
+    def _prefix_matches(self, term):
+        scores = {}
+        start = bisect_left(self.tokens, term)
+        for token in self.tokens[start:]:
+            if not token.startswith(term):
+                break
+            for product_id, weight in self.postings[token].items():
+                scores[product_id] = max(scores.get(product_id, 0), weight)
+        return scores
+
+    def search(self, terms):
+        """Return {product_id: score} for products matching every term (by prefix)"""
+        result = None
+        for term in terms:
+            matches = self._prefix_matches(term)
+            if result is None:
+                result = matches
+            else:
+                result = {pid: result[pid] + score for pid, score in matches.items() if pid in result}
+            if not result:
+                return {}
+        return result or {}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def invalidate_index():
+    """Drop the in-process index; it is rebuilt on the next search"""
+    global _index
+    _index = None
+
+
+def get_index(using):
+    global _index
+    with _index_lock:
+        if _index is None:
+            from .models import Product
+
+            rows = Product.objects.using(using).values('id', *FIELD_WEIGHTS).iterator(chunk_size=2000)
+            _index = InvertedIndex(rows)
+        return _index
+
+
+def build_search_query(terms):
+    """
+    Prefix-match every term against the search vector
+
+    Migration 0004 indexes name and descriptions with the `english` config
+    but sku and brand with `simple` (unstemmed), so each term matches if
+    either its english or its simple lexeme does.
+    """
+    query = None
+    for term in terms:
+        term_query = (
+            SearchQuery(f'{term}:*', config='english', search_type='raw')
+            | SearchQuery(f'{term}:*', config='simple', search_type='raw')
+        )
+        query = term_query if query is None else query & term_query
+    return query
+
+
+def sku_match(raw_terms):
+    """
+    SKU prefix match on the raw search terms
+
+    Postgres splits part numbers like "DW-123" into 'dw' and '-123', which
+    the \\w+ query tokens ('dw', '123') do not match, so SKUs are also
+    matched as typed (UPPER(sku) pattern index, migration 0010).
+    """
+    return reduce(operator.or_, (Q(sku__istartswith=term) for term in raw_terms))
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for SearchFilter on product lists
+
+    Keeps the `search` query parameter contract. Results are ordered by
+    relevance unless the client asked for an explicit `ordering`, so this
+    backend must come after OrderingFilter in `filter_backends`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = [token for term in self.get_search_terms(request) for token in tokenize(term)]
+        if not terms:
+            return queryset
+
+        rank_results = api_settings.ORDERING_PARAM not in request.query_params
+        fallback_ordering = [field for field in queryset.query.order_by if field != 'search_rank']
+
+        if connections[queryset.db].vendor == 'postgresql':
+            query = build_search_query(terms)
+            queryset = queryset.filter(Q(search_vector=query) | sku_match(self.get_search_terms(request)))
+            if rank_results:
+                queryset = queryset.annotate(
+                    search_rank=SearchRank(F('search_vector'), query)
+                ).order_by('-search_rank', *fallback_ordering)
+            return queryset
+
+        scores = get_index(queryset.db).search(terms)
+        queryset = queryset.filter(pk__in=list(scores))
+        if rank_results and scores:
+            queryset = queryset.annotate(
+                search_rank=Case(
+                    *[When(pk=pk, then=Value(score)) for pk, score in scores.items()],
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )
+            ).order_by('-search_rank', *fallback_ordering)
+        return queryset
@@ -1,18 +1,25 @@
+from decimal import Decimal
+
+from django.db import transaction
 from rest_framework import serializers
 from .models import (
     Product, Category, Brand, Warehouse, ProductImage, 
-    TechnicalSpecification, WarehouseStock, ProductReview
+    TechnicalSpecification, WarehouseStock, ProductReview, StockMovement
 )
+from .services import sync_specifications
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'description', 'image', 'parent', 'is_active']
+        fields = [
+            'id', 'name', 'slug', 'description', 'image', 'parent', 'is_active',
+            'active_product_count', 'total_product_count',
+        ]
 
 class BrandSerializer(serializers.ModelSerializer):
     class Meta:
         model = Brand
-        fields = ['id', 'name', 'slug', 'description', 'logo', 'website', 'is_active']
+        fields = ['id', 'name', 'slug', 'description', 'logo', 'website', 'is_active', 'active_product_count']
 
 class WarehouseSerializer(serializers.ModelSerializer):
     class Meta:
@@ -24,6 +31,15 @@ class TechnicalSpecificationSerializer(serializers.ModelSerializer):
         model = TechnicalSpecification
         fields = ['label', 'value', 'spec_type']
 
+def validate_complete(serializer_class, items):
+    """
+    Re-validate nested items without `partial`, which nested serializers
+    inherit from their root (so a PATCH would accept a spec without a value)
+    """
+    serializer = serializer_class(data=items, many=True)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
 class ProductImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductImage
@@ -36,6 +52,13 @@ class WarehouseStockSerializer(serializers.ModelSerializer):
         model = WarehouseStock
         fields = ['warehouse', 'quantity', 'last_updated']
 
+class StockMovementSerializer(serializers.ModelSerializer):
+    warehouse = serializers.CharField(source='warehouse.code', read_only=True)
+    
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'warehouse', 'kind', 'quantity', 'reference', 'created_at']
+
 class ProductReviewSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     
@@ -49,6 +72,7 @@ class ProductListSerializer(serializers.ModelSerializer):
     primary_image = serializers.SerializerMethodField()
     stock_status = serializers.SerializerMethodField()
     discount_percentage = serializers.SerializerMethodField()
+    average_rating = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
@@ -56,17 +80,19 @@ class ProductListSerializer(serializers.ModelSerializer):
             'id', 'name', 'slug', 'sku', 'short_description',
             'price', 'compare_price', 'discount_percentage',
             'category', 'brand', 'primary_image', 'image_url', 'stock_status',
-            'is_featured', 'created_at'
+            'average_rating', 'rating_count', 'is_featured', 'created_at'
         ]
 
     def get_primary_image(self, obj):
-        primary = obj.images.filter(is_primary=True).first()
-        if primary:
-            return ProductImageSerializer(primary).data
-        # Return first image if no primary is set
-        first_image = obj.images.first()
-        if first_image:
-            return ProductImageSerializer(first_image).data
+        # Use the images prefetched by Product.objects.with_list_relations()
+        listing_images = getattr(obj, 'listing_images', None)
+        if listing_images is not None:
+            image = listing_images[0] if listing_images else None
+        else:
+            # Return first image if no primary is set
+            image = obj.images.filter(is_primary=True).first() or obj.images.first()
+        if image:
+            return ProductImageSerializer(image).data
         return None
 
     def get_stock_status(self, obj):
@@ -82,6 +108,9 @@ class ProductListSerializer(serializers.ModelSerializer):
     def get_discount_percentage(self, obj):
         return obj.discount_percentage
 
+    def get_average_rating(self, obj):
+        return obj.average_rating
+
 class ProductDetailSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     brand = BrandSerializer(read_only=True)
@@ -103,7 +132,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             'track_stock', 'stock_quantity', 'low_stock_threshold',
             'stock_status', 'is_active', 'is_featured', 'is_digital',
             'images', 'specifications', 'warehouse_stock', 'reviews',
-            'average_rating', 'meta_title', 'meta_description',
+            'average_rating', 'rating_count', 'meta_title', 'meta_description',
             'created_at', 'updated_at'
         ]
 
@@ -121,10 +150,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         return obj.discount_percentage
 
     def get_average_rating(self, obj):
-        reviews = obj.reviews.filter(is_approved=True)
-        if reviews.exists():
-            return round(sum(review.rating for review in reviews) / len(reviews), 1)
-        return 0
+        return obj.average_rating
 
 class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     specifications = TechnicalSpecificationSerializer(many=True, required=False)
@@ -142,29 +168,111 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
             'specifications'
         ]
 
+    def validate_specifications(self, value):
+        return validate_complete(TechnicalSpecificationSerializer, value)
+
+    def validate_stock_quantity(self, value):
+        # Warehouse rows are the source of truth once a product has any
+        if self.instance and value != self.instance.stock_quantity and self.instance.warehouse_stock.exists():
+            raise serializers.ValidationError(
+                'This product is stocked per warehouse; its stock is the sum of its warehouse stock.'
+            )
+        return value
+
     def create(self, validated_data):
         specs_data = validated_data.pop('specifications', [])
         
         product = Product.objects.create(**validated_data)
         
         # Create specifications
-        for spec_data in specs_data:
-            TechnicalSpecification.objects.create(product=product, **spec_data)
+        TechnicalSpecification.objects.bulk_create([
+            TechnicalSpecification(product=product, sort_order=position, **spec_data)
+            for position, spec_data in enumerate(specs_data)
+        ])
         
         return product
 
     def update(self, instance, validated_data):
-        specs_data = validated_data.pop('specifications', [])
-        
-        # Update product fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        # Omitted specifications are left as they are; an empty list clears them
+        specs_data = validated_data.pop('specifications', None)
         
-        # Handle specifications
-        if specs_data is not None:
-            instance.specifications.all().delete()
-            for spec_data in specs_data:
-                TechnicalSpecification.objects.create(product=instance, **spec_data)
+        with transaction.atomic():
+            # Update product fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+            
+            # Apply only the spec changes, matched by label
+            if specs_data is not None:
+                sync_specifications({instance.pk: specs_data})
         
         return instance
+
+
+class ImportImageSerializer(serializers.Serializer):
+    image = serializers.URLField()
+    alt_text = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+    is_primary = serializers.BooleanField(required=False, default=False)
+
+
+class ProductImportSerializer(serializers.Serializer):
+    """
+    One row of a bulk import (see bulk.py). Category and brand are slugs and
+    warehouse stock is keyed by warehouse code; they are resolved per batch,
+    not per row, so validating a row never touches the database.
+    """
+    sku = serializers.CharField(max_length=50)
+    name = serializers.CharField(max_length=200)
+    slug = serializers.SlugField(max_length=220, required=False)
+    description = serializers.CharField()
+    short_description = serializers.CharField(max_length=500, allow_blank=True)
+    barcode = serializers.CharField(max_length=50, allow_null=True, allow_blank=True)
+    category = serializers.SlugField(max_length=120)
+    brand = serializers.SlugField(max_length=120)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'))
+    compare_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), allow_null=True)
+    cost_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), allow_null=True)
+    condition = serializers.ChoiceField(choices=Product.CONDITION_CHOICES)
+    weight = serializers.DecimalField(max_digits=8, decimal_places=2, allow_null=True)
+    dimensions = serializers.CharField(max_length=100, allow_blank=True)
+    image_url = serializers.URLField(max_length=500, allow_null=True, allow_blank=True)
+    track_stock = serializers.BooleanField()
+    stock_quantity = serializers.IntegerField(min_value=0)
+    low_stock_threshold = serializers.IntegerField(min_value=0)
+    is_active = serializers.BooleanField()
+    is_featured = serializers.BooleanField()
+    is_digital = serializers.BooleanField()
+    meta_title = serializers.CharField(max_length=200, allow_blank=True)
+    meta_description = serializers.CharField(max_length=300, allow_blank=True)
+    specifications = TechnicalSpecificationSerializer(many=True)
+    images = ImportImageSerializer(many=True)
+    stock = serializers.DictField(child=serializers.IntegerField(min_value=0))
+
+    # Rows are validated with partial=True; specs and images replace the
+    # product's full lists, so each item must still be complete
+    def validate_specifications(self, value):
+        return validate_complete(TechnicalSpecificationSerializer, value)
+
+    def validate_images(self, value):
+        return validate_complete(ImportImageSerializer, value)
+
+
+class PriceStockUpdateSerializer(serializers.Serializer):
+    """One item of an ERP price/stock batch (see bulk.sync_prices_and_stock)"""
+    sku = serializers.CharField(max_length=50)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+    compare_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal('0'), allow_null=True, required=False
+    )
+    stock_quantity = serializers.IntegerField(min_value=0, required=False)
+    warehouse_code = serializers.CharField(max_length=10, required=False)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if ('warehouse_code' in attrs) != ('quantity' in attrs):
+            raise serializers.ValidationError('warehouse_code and quantity must be sent together.')
+        if 'warehouse_code' in attrs and 'stock_quantity' in attrs:
+            raise serializers.ValidationError('Send either stock_quantity or warehouse_code and quantity, not both.')
+        if len(attrs) == 1:
+            raise serializers.ValidationError('Nothing to update.')
+        return attrs
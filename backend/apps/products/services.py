@@ -0,0 +1,225 @@
+from collections import Counter
+
+from django.db.models import Avg, Count, DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Brand, Category, Product, ProductImage, ProductReview, TechnicalSpecification
+
+
+def refresh_product_ratings(product_ids) -> int:
+    """
+    Recompute the denormalized rating columns for the given products
+
+    Runs a single UPDATE with correlated aggregates over the approved reviews,
+    so it is safe to call after any review create/update/delete/approval.
+
+    Returns:
+        Number of products updated
+    """
+    approved = (
+        ProductReview.objects
+        .filter(product=OuterRef('pk'), is_approved=True)
+        .order_by()
+        .values('product')
+    )
+    return Product.objects.filter(pk__in=product_ids).update(
+        rating_count=Coalesce(Subquery(approved.annotate(c=Count('pk')).values('c')), 0),
+        rating_sum=Coalesce(Subquery(approved.annotate(s=Sum('rating')).values('s')), 0),
+        rating_average=Coalesce(
+            Subquery(
+                approved.annotate(
+                    a=Cast(Avg('rating'), DecimalField(max_digits=3, decimal_places=2))
+                ).values('a')
+            ),
+            0,
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def product_count_key(product):
+    """The fields of a product that decide which counters it contributes to"""
+    return (product.category_id, product.brand_id, product.is_active)
+
+
+def _category_ancestors(category_ids):
+    """Map each category id to itself plus all of its ancestors, read off the materialized path"""
+    return {
+        pk: [int(part) for part in path.split('/') if part] or [pk]
+        for pk, path in Category.objects.filter(pk__in=category_ids).values_list('pk', 'path')
+    }
+
+
+def _apply_deltas(queryset, field, deltas):
+    for delta in set(deltas.values()) - {0}:
+        ids = [pk for pk, value in deltas.items() if value == delta]
+        queryset.filter(pk__in=ids).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def adjust_product_counts(before, after):
+    """
+    Move the active product counters from one product state to another
+
+    `before`/`after` are product_count_key() tuples, or None for a product
+    that did not exist yet / no longer exists. Only the difference is
+    written, with F() expressions, so concurrent saves do not lose updates.
+    The category total is applied to the category and all its ancestors.
+    """
+    categories, brands = Counter(), Counter()
+    for state, sign in ((before, -1), (after, 1)):
+        if state and state[2]:
+            categories[state[0]] += sign
+            brands[state[1]] += sign
+
+    categories = {pk: delta for pk, delta in categories.items() if delta}
+    brands = {pk: delta for pk, delta in brands.items() if delta}
+    if brands:
+        _apply_deltas(Brand.objects, 'active_product_count', brands)
+    if categories:
+        _apply_deltas(Category.objects, 'active_product_count', categories)
+        totals = Counter()
+        for category_id, chain in _category_ancestors(categories).items():
+            for ancestor_id in chain:
+                totals[ancestor_id] += categories[category_id]
+        _apply_deltas(Category.objects, 'total_product_count', totals)
+
+
+def rollup_category_totals(active_counts=None) -> int:
+    """
+    Recompute total_product_count for every category from the per-category counts
+
+    The category table is small, so the tree is summed in Python. Returns the
+    number of categories whose total changed.
+    """
+    rows = list(Category.objects.only('pk', 'parent_id', 'active_product_count', 'total_product_count'))
+    if active_counts is not None:
+        for category in rows:
+            category.active_product_count = active_counts.get(category.pk, 0)
+
+    by_id = {category.pk: category for category in rows}
+    totals = Counter()
+    for category in rows:
+        seen, current = set(), category
+        while current is not None and current.pk not in seen:
+            seen.add(current.pk)
+            totals[current.pk] += category.active_product_count
+            current = by_id.get(current.parent_id)
+
+    changed = [
+        category for category in rows
+        if category.total_product_count != totals[category.pk]
+        or (active_counts is not None and category.active_product_count != active_counts.get(category.pk, 0))
+    ]
+    for category in changed:
+        category.total_product_count = totals[category.pk]
+    Category.objects.bulk_update(changed, ['active_product_count', 'total_product_count'])
+    return len(changed)
+
+
+def reconcile_product_counts() -> dict:
+    """
+    Recount active products per category and brand from scratch
+
+    Used after bulk loads that bypass signals and to repair drift. Returns
+    how many categories and brands had to be corrected.
+    """
+    active = Product.objects.filter(is_active=True).order_by()
+    category_counts = dict(active.values('category_id').annotate(n=Count('pk')).values_list('category_id', 'n'))
+    brand_counts = dict(active.values('brand_id').annotate(n=Count('pk')).values_list('brand_id', 'n'))
+
+    brands = [
+        brand for brand in Brand.objects.only('pk', 'active_product_count')
+        if brand.active_product_count != brand_counts.get(brand.pk, 0)
+    ]
+    for brand in brands:
+        brand.active_product_count = brand_counts.get(brand.pk, 0)
+    Brand.objects.bulk_update(brands, ['active_product_count'])
+
+    return {'categories': rollup_category_totals(category_counts), 'brands': len(brands)}
+
+
+def sync_specifications(specs_by_product) -> dict:
+    """
+    Bring the products' specifications in line with the given lists
+
+    `specs_by_product` maps a product id to its full list of spec dicts
+    (label, value, spec_type), in display order. Existing rows are matched by
+    label (in order, for repeated labels): matches are updated only if their
+    value, type or position changed, new labels are inserted and labels that
+    are gone are deleted. That is at most one SELECT, bulk_create, bulk_update
+    and DELETE for the whole call, and nothing is written for unchanged specs.
+
+    Returns:
+        Counts of created, updated and deleted rows
+    """
+    existing = {}
+    for spec in TechnicalSpecification.objects.filter(product_id__in=specs_by_product).order_by('sort_order', 'pk'):
+        existing.setdefault((spec.product_id, spec.label), []).append(spec)
+
+    to_create, to_update = [], []
+    for product_id, specs in specs_by_product.items():
+        for position, data in enumerate(specs):
+            matches = existing.get((product_id, data['label']))
+            if not matches:
+                to_create.append(TechnicalSpecification(product_id=product_id, sort_order=position, **data))
+                continue
+            spec = matches.pop(0)
+            values = {'value': data['value'], 'spec_type': data.get('spec_type', 'other'), 'sort_order': position}
+            if any(getattr(spec, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(spec, field, value)
+                to_update.append(spec)
+
+    stale = [spec.pk for matches in existing.values() for spec in matches]
+    if stale:
+        TechnicalSpecification.objects.filter(pk__in=stale).delete()
+    if to_update:
+        TechnicalSpecification.objects.bulk_update(to_update, ['value', 'spec_type', 'sort_order'])
+    if to_create:
+        TechnicalSpecification.objects.bulk_create(to_create)
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(stale)}
+
+
+def sync_images(images_by_product) -> dict:
+    """
+    Bring the products' images in line with the given lists
+
+    Same approach as sync_specifications, with rows matched by image URL:
+    `images_by_product` maps a product id to its full list of image dicts
+    (image, alt_text, is_primary) in display order. Only images that are
+    gone are deleted, so a re-import of unchanged images writes nothing.
+
+    Returns:
+        Counts of created, updated and deleted rows
+    """
+    existing = {}
+    for image in ProductImage.objects.filter(product_id__in=images_by_product).order_by('sort_order', 'pk'):
+        existing.setdefault((image.product_id, image.image), []).append(image)
+
+    to_create, to_update = [], []
+    for product_id, images in images_by_product.items():
+        for position, data in enumerate(images):
+            matches = existing.get((product_id, data['image']))
+            if not matches:
+                to_create.append(ProductImage(product_id=product_id, sort_order=position, **data))
+                continue
+            image = matches.pop(0)
+            values = {
+                'alt_text': data.get('alt_text', ''), 'is_primary': data.get('is_primary', False),
+                'sort_order': position,
+            }
+            if any(getattr(image, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(image, field, value)
+                to_update.append(image)
+
+    stale = [image.pk for matches in existing.values() for image in matches]
+    if stale:
+        ProductImage.objects.filter(pk__in=stale).delete()
+    if to_update:
+        ProductImage.objects.bulk_update(to_update, ['alt_text', 'is_primary', 'sort_order'])
+    if to_create:
+        ProductImage.objects.bulk_create(to_create)
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(stale)}
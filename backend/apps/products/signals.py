@@ -0,0 +1,205 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_versions
+from .ledger import record_movements
+from .models import (
+    Brand, Category, Product, ProductImage, ProductReview, StockMovement,
+    TechnicalSpecification, Warehouse, WarehouseStock
+)
+from .search import invalidate_index
+from .services import (
+    adjust_product_counts, product_count_key, refresh_product_ratings, rollup_category_totals
+)
+from .stock import rollup_product_stock
+
+
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def update_product_rating(sender, instance, **kwargs):
+    """Keep Product.rating_* in step with review create/update/delete/approval"""
+    refresh_product_ratings([instance.product_id])
+    transaction.on_commit(lambda: bump_versions('products'))
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_count_key(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        instance._count_key_before = None
+        return
+    before = Product.objects.filter(pk=instance.pk).values_list('category_id', 'brand_id', 'is_active').first()
+    instance._count_key_before = before
+
+
+@receiver(post_save, sender=Product)
+def update_counts_on_product_save(sender, instance, raw=False, **kwargs):
+    """Keep Category/Brand active_product_count in step with create, (de)activation and moves"""
+    if raw:
+        return
+    adjust_product_counts(getattr(instance, '_count_key_before', None), product_count_key(instance))
+
+
+@receiver(post_delete, sender=Product)
+def update_counts_on_product_delete(sender, instance, **kwargs):
+    adjust_product_counts(product_count_key(instance), None)
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_parent(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        instance._parent_before = None
+        return
+    instance._parent_before = Category.objects.filter(pk=instance.pk).values_list('parent_id', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def rollup_on_category_move(sender, instance, created, raw=False, **kwargs):
+    """Re-parenting a category moves its products' contribution to other ancestors"""
+    if not raw and not created and instance.parent_id != getattr(instance, '_parent_before', instance.parent_id):
+        rollup_category_totals()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def invalidate_search_index(sender, **kwargs):
+    """Rebuild the in-process (non-Postgres) search index on catalog changes"""
+    invalidate_index()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def bump_product_version(sender, **kwargs):
+    transaction.on_commit(lambda: bump_versions('products'))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_category_version(sender, **kwargs):
+    transaction.on_commit(lambda: bump_versions('categories'))
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def bump_brand_version(sender, **kwargs):
+    transaction.on_commit(lambda: bump_versions('brands'))
+
+
+@receiver(post_save, sender=Warehouse)
+@receiver(post_delete, sender=Warehouse)
+def bump_warehouse_version(sender, **kwargs):
+    transaction.on_commit(lambda: bump_versions('warehouses'))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=TechnicalSpecification)
+@receiver(post_delete, sender=TechnicalSpecification)
+def touch_product(sender, instance, **kwargs):
+    """Child rows are part of the product detail, so move its updated_at (and ETag)"""
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=WarehouseStock)
+def remember_warehouse_quantity(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        instance._quantity_before = 0
+        return
+    # WarehouseStock.save() runs in a transaction, so the lock holds until the row is written
+    instance._quantity_before = (
+        WarehouseStock.objects.select_for_update().filter(pk=instance.pk).values_list('quantity', flat=True).first() or 0
+    )
+
+
+@receiver(post_save, sender=WarehouseStock)
+def record_warehouse_adjustment(sender, instance, raw=False, **kwargs):
+    """Edits made through save() (admin, shell, scripts) go into the stock ledger as adjustments"""
+    if raw:
+        return
+    record_movements([StockMovement(
+        product_id=instance.product_id, warehouse_id=instance.warehouse_id, kind='adjustment',
+        quantity=instance.quantity - getattr(instance, '_quantity_before', 0),
+    )])
+
+
+@receiver(post_delete, sender=WarehouseStock)
+def record_warehouse_removal(sender, instance, origin=None, **kwargs):
+    # When the product or warehouse itself is deleted its movements go with it
+    if isinstance(origin, WarehouseStock) or (isinstance(origin, QuerySet) and origin.model is WarehouseStock):
+        record_movements([StockMovement(
+            product_id=instance.product_id, warehouse_id=instance.warehouse_id, kind='adjustment',
+            quantity=-instance.quantity,
+        )])
+
+
+@receiver(post_save, sender=WarehouseStock)
+@receiver(post_delete, sender=WarehouseStock)
+def rollup_warehouse_stock(sender, instance, raw=False, **kwargs):
+    """Product.stock_quantity is the warehouse total; this also moves updated_at (and the ETag)"""
+    if raw:
+        return
+    rollup_product_stock([instance.product_id])
+    transaction.on_commit(lambda: bump_versions('products'))
+
+
+@receiver(pre_save, sender=Warehouse)
+def remember_warehouse_active(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        instance._active_before = None
+        return
+    instance._active_before = Warehouse.objects.filter(pk=instance.pk).values_list('is_active', flat=True).first()
+
+
+@receiver(post_save, sender=Warehouse)
+def rollup_on_warehouse_toggle(sender, instance, created, raw=False, **kwargs):
+    """Only active warehouses count towards stock, so (de)activating one moves its products' totals"""
+    if not raw and not created and instance.is_active != getattr(instance, '_active_before', instance.is_active):
+        rollup_product_stock(
+            WarehouseStock.objects.filter(warehouse=instance).values_list('product_id', flat=True)
+        )
+        transaction.on_commit(lambda: bump_versions('products'))
+
+
+# post_delete receivers that keep denormalised data in step one row at a time.
+# Bulk deletes mute them and reconcile once afterwards (see delete_generated).
+DELETE_RECEIVERS = [
+    (update_product_rating, ProductReview),
+    (update_counts_on_product_delete, Product),
+    (invalidate_search_index, Product),
+    (invalidate_search_index, Brand),
+    (bump_product_version, Product),
+    (bump_product_version, ProductImage),
+    (bump_category_version, Category),
+    (bump_brand_version, Brand),
+    (bump_warehouse_version, Warehouse),
+    (touch_product, ProductImage),
+    (touch_product, TechnicalSpecification),
+    (record_warehouse_removal, WarehouseStock),
+    (rollup_warehouse_stock, WarehouseStock),
+]
+
+
+@contextmanager
+def delete_receivers_muted():
+    """
+    Disconnect DELETE_RECEIVERS for the duration of a bulk delete
+
+    With no delete receivers left, Django also deletes child rows (images,
+    specs, stock, movements) with one DELETE each instead of loading them.
+    The caller must reconcile counts, stock rollups and caches itself.
+    """
+    for handler, sender in DELETE_RECEIVERS:
+        post_delete.disconnect(handler, sender=sender)
+    try:
+        yield
+    finally:
+        for handler, sender in DELETE_RECEIVERS:
+            post_delete.connect(handler, sender=sender)
@@ -0,0 +1,278 @@
+"""
+Stock reservation for checkout, and the warehouse -> product stock rollup
+
+WarehouseStock is the source of truth for products stocked per warehouse;
+Product.stock_quantity is a maintained rollup (the sum over active
+warehouses) so list filters and ordering stay on one indexed column. Every
+writer of warehouse rows ends with rollup_product_stock(), which is a single
+aggregate UPDATE; reconcile_stock() finds and repairs any drift in batch.
+Products without warehouse rows keep stock_quantity as their own figure.
+
+Every change to warehouse rows is also appended to the stock ledger
+(ledger.py) as a sale, receipt, transfer or adjustment movement.
+
+Warehouse rows are locked in a consistent order (product, warehouse) to avoid
+deadlocks, and every decrement is a conditional `quantity >= n` UPDATE so an
+oversell is impossible even on backends without SELECT ... FOR UPDATE.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import bump_versions
+from .ledger import movements_between, record_movements
+from .models import Product, StockMovement, WarehouseStock
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product, requested, available):
+        self.product = product
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"Only {available} of {product.name} ({product.sku}) available, {requested} requested"
+        )
+
+
+def reserve_stock(lines, reference=''):
+    """
+    Reserve stock for checkout lines and decrement it
+
+    Must run inside a transaction. Tracked products with warehouse stock are
+    allocated from the warehouses holding the most units first (fewest
+    splits) and each allocation is recorded as a sale in the stock ledger;
+    tracked products without warehouse rows are decremented on
+    Product.stock_quantity directly.
+
+    Args:
+        lines: List of (product, quantity) tuples, in order line order
+        reference: Stored on the ledger movements (the order number)
+
+    Returns:
+        List with one entry per line: a list of (warehouse_id, quantity)
+        allocations (empty for untracked or warehouse-less products)
+
+    Raises:
+        InsufficientStock: If any line cannot be fully reserved
+    """
+    tracked_ids = {product.pk for product, _ in lines if product.track_stock}
+
+    rows_by_product = defaultdict(list)
+    if tracked_ids:
+        locked_rows = (
+            WarehouseStock.objects
+            .select_for_update(of=('self',))
+            .filter(product_id__in=tracked_ids, warehouse__is_active=True)
+            .order_by('product_id', 'warehouse_id')
+        )
+        for row in locked_rows:
+            rows_by_product[row.product_id].append(row)
+
+    allocations = []
+    product_totals = defaultdict(int)
+    for product, quantity in lines:
+        if not product.track_stock:
+            allocations.append([])
+            continue
+
+        rows = rows_by_product.get(product.pk)
+        if not rows:
+            # No per-warehouse stock recorded, reserve against the product total
+            reserved = Product.objects.filter(
+                pk=product.pk, stock_quantity__gte=quantity
+            ).update(stock_quantity=F('stock_quantity') - quantity, updated_at=timezone.now())
+            if not reserved:
+                product.refresh_from_db(fields=['stock_quantity'])
+                raise InsufficientStock(product, quantity, product.stock_quantity)
+            allocations.append([])
+            continue
+
+        available = sum(row.quantity for row in rows)
+        if available < quantity:
+            raise InsufficientStock(product, quantity, available)
+
+        line_allocations = []
+        remaining = quantity
+        for row in sorted(rows, key=lambda r: (-r.quantity, r.warehouse_id)):
+            if not remaining:
+                break
+            take = min(row.quantity, remaining)
+            if not take:
+                continue
+            updated = WarehouseStock.objects.filter(
+                pk=row.pk, quantity__gte=take
+            ).update(quantity=F('quantity') - take)
+            if not updated:
+                # Only reachable when the backend could not lock the row
+                raise InsufficientStock(product, quantity, available - (quantity - remaining))
+            row.quantity -= take
+            remaining -= take
+            line_allocations.append((row.warehouse_id, take))
+        allocations.append(line_allocations)
+        product_totals[product.pk] += quantity
+
+    if product_totals:
+        # Keep the product-level figure (used by list filters) in step, one UPDATE
+        rollup_product_stock(product_totals)
+        record_movements(
+            StockMovement(
+                product_id=product.pk, warehouse_id=warehouse_id, kind='sale', quantity=-taken, reference=reference,
+            )
+            for (product, _), line_allocations in zip(lines, allocations)
+            for warehouse_id, taken in line_allocations
+        )
+
+    if any(product.track_stock for product, _ in lines):
+        # Stock status is part of cached list responses
+        transaction.on_commit(lambda: bump_versions('products'))
+
+    return allocations
+
+
+def receive_stock(product, warehouse, quantity, reference=''):
+    """Add received units to a warehouse (creating its stock row) and record the receipt"""
+    if quantity <= 0:
+        raise ValueError('Received quantity must be positive')
+    with transaction.atomic():
+        updated = WarehouseStock.objects.filter(product=product, warehouse=warehouse).update(
+            quantity=F('quantity') + quantity, last_updated=timezone.now(),
+        )
+        if not updated:
+            WarehouseStock.objects.bulk_create([WarehouseStock(product=product, warehouse=warehouse, quantity=quantity)])
+        record_movements([StockMovement(
+            product=product, warehouse=warehouse, kind='receipt', quantity=quantity, reference=reference,
+        )])
+        rollup_product_stock([product.pk])
+        transaction.on_commit(lambda: bump_versions('products'))
+
+
+def transfer_stock(product, source, destination, quantity, reference=''):
+    """
+    Move units of a product from one warehouse to another
+
+    The source is decremented with the same conditional UPDATE as checkout,
+    so a transfer can never take more than is there. Both legs are recorded
+    as 'transfer' movements sharing the reference.
+
+    Raises:
+        InsufficientStock: If the source warehouse holds fewer units
+    """
+    if quantity <= 0:
+        raise ValueError('Transferred quantity must be positive')
+    if source.pk == destination.pk:
+        raise ValueError('Source and destination warehouse are the same')
+    reference = reference or f'transfer {source.code}->{destination.code}'
+    with transaction.atomic():
+        taken = WarehouseStock.objects.filter(
+            product=product, warehouse=source, quantity__gte=quantity
+        ).update(quantity=F('quantity') - quantity, last_updated=timezone.now())
+        if not taken:
+            available = WarehouseStock.objects.filter(product=product, warehouse=source).values_list('quantity', flat=True).first()
+            raise InsufficientStock(product, quantity, available or 0)
+        updated = WarehouseStock.objects.filter(product=product, warehouse=destination).update(
+            quantity=F('quantity') + quantity, last_updated=timezone.now(),
+        )
+        if not updated:
+            WarehouseStock.objects.bulk_create([WarehouseStock(product=product, warehouse=destination, quantity=quantity)])
+        record_movements([
+            StockMovement(product=product, warehouse=source, kind='transfer', quantity=-quantity, reference=reference),
+            StockMovement(product=product, warehouse=destination, kind='transfer', quantity=quantity, reference=reference),
+        ])
+        # Totals only move when one side is an inactive warehouse, but that is one cheap UPDATE
+        rollup_product_stock([product.pk])
+        transaction.on_commit(lambda: bump_versions('products'))
+
+
+def upsert_warehouse_stock(quantities, reference=''):
+    """
+    Set warehouse stock to absolute quantities
+
+    `quantities` maps (product_id, warehouse_id) to the new quantity. The
+    differences from the current rows are recorded as ledger adjustments,
+    so the current rows are locked before they are read: a sale committed
+    between the read and the write would otherwise be lost from the ledger.
+    Must run inside a transaction. The caller rolls the products up.
+    """
+    pairs = sorted(quantities)
+    # Missing rows are created at 0 first so every pair can be locked, then
+    # locked in the same (product, warehouse) order as checkout takes them
+    WarehouseStock.objects.bulk_create(
+        [WarehouseStock(product_id=product_id, warehouse_id=warehouse_id, quantity=0) for product_id, warehouse_id in pairs],
+        ignore_conflicts=True,
+    )
+    before = {
+        (product_id, warehouse_id): quantity
+        for product_id, warehouse_id, quantity in WarehouseStock.objects
+        .select_for_update()
+        .filter(product_id__in={product_id for product_id, _ in pairs})
+        .order_by('product_id', 'warehouse_id')
+        .values_list('product_id', 'warehouse_id', 'quantity')
+    }
+    WarehouseStock.objects.bulk_create(
+        [
+            WarehouseStock(product_id=product_id, warehouse_id=warehouse_id, quantity=quantities[(product_id, warehouse_id)])
+            for product_id, warehouse_id in pairs
+        ],
+        update_conflicts=True, unique_fields=['product', 'warehouse'],
+        update_fields=['quantity', 'last_updated'],
+    )
+    record_movements(movements_between(before, quantities, reference=reference))
+
+
+def _warehouse_totals():
+    """Correlated subquery: a product's stock summed over active warehouses"""
+    return Coalesce(
+        Subquery(
+            WarehouseStock.objects
+            .filter(product=OuterRef('pk'), warehouse__is_active=True)
+            .order_by().values('product')
+            .annotate(total=Sum('quantity')).values('total')
+        ),
+        0,
+    )
+
+
+def rollup_product_stock(product_ids) -> int:
+    """
+    Set stock_quantity to the warehouse total for the given products
+
+    One aggregate UPDATE. Callers pass products whose warehouse rows just
+    changed (including ones whose last row was removed, which drop to 0).
+
+    Returns:
+        Number of products updated
+    """
+    return Product.objects.filter(pk__in=product_ids).update(
+        stock_quantity=_warehouse_totals(), updated_at=timezone.now(),
+    )
+
+
+def stock_drift():
+    """Products stocked per warehouse whose stock_quantity disagrees with their rows"""
+    return (
+        Product.objects
+        .filter(Exists(WarehouseStock.objects.filter(product=OuterRef('pk'))))
+        .annotate(warehouse_total=_warehouse_totals())
+        .filter(~Q(stock_quantity=F('warehouse_total')))
+    )
+
+
+def reconcile_stock(batch_size=1000, dry_run=False) -> list:
+    """
+    Recompute the rollup for every product that has drifted
+
+    Drift is found with one query and fixed batch_size products per UPDATE.
+
+    Returns:
+        List of (product_id, sku, stock_quantity, warehouse_total) that were
+        (or, with dry_run, would be) corrected
+    """
+    drifted = list(stock_drift().order_by('pk').values_list('pk', 'sku', 'stock_quantity', 'warehouse_total'))
+    if not dry_run and drifted:
+        for start in range(0, len(drifted), batch_size):
+            rollup_product_stock([row[0] for row in drifted[start:start + batch_size]])
+        transaction.on_commit(lambda: bump_versions('products'))
+    return drifted
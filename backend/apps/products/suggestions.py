@@ -0,0 +1,110 @@
+"""
+Search box autocomplete
+
+Product names are matched with `icontains`, which PostgreSQL answers from the
+pg_trgm GIN index on UPPER(name) (migration 0005). Categories and brands are
+small, so they are served from an in-memory sorted prefix index. Whole
+responses are cached per normalized query and invalidated through the
+catalog versions in cache.py.
+"""
+import threading
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Value, When
+
+from .cache import get_versions, versioned_key
+from .models import Brand, Category, Product
+
+SUGGESTION_SECTIONS = ('products', 'categories', 'brands')
+SUGGESTION_CACHE_TIMEOUT = 60 * 5
+MAX_QUERY_LENGTH = 50
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())[:MAX_QUERY_LENGTH]
+
+
+class PrefixIndex:
+    """
+    Sorted (suffix, id) pairs for every word boundary of each name, so both
+    "power" and "tools" find "Power Tools" with a bisect
+    """
+
+    def __init__(self, rows):
+        self.rows = {}
+        entries = []
+        for row in rows:
+            self.rows[row['id']] = row
+            words = normalize_query(row['name']).split(' ')
+            for i in range(len(words)):
+                entries.append((' '.join(words[i:]), row['name'], row['id']))
+        entries.sort()
+        self.keys = [entry[0] for entry in entries]
+        self.entries = entries
+
+    def lookup(self, prefix, limit):
+        seen = []
+        start = bisect_left(self.keys, prefix)
+        for key, _, row_id in self.entries[start:]:
+            if not key.startswith(prefix):
+                break
+            if row_id not in seen:
+                seen.append(row_id)
+        rows = sorted((self.rows[row_id] for row_id in seen), key=lambda row: row['name'])
+        return rows[:limit]
+
+
+class _IndexCache:
+    """Per-process PrefixIndex, rebuilt when its catalog section version changes"""
+
+    def __init__(self, model, section):
+        self.model = model
+        self.section = section
+        self.version = None
+        self.index = None
+        self.lock = threading.Lock()
+
+    def get(self, version):
+        with self.lock:
+            if self.index is None or self.version != version:
+                rows = self.model.objects.filter(is_active=True).values('id', 'name', 'slug')
+                self.index = PrefixIndex(rows)
+                self.version = version
+            return self.index
+
+
+_category_index = _IndexCache(Category, 'categories')
+_brand_index = _IndexCache(Brand, 'brands')
+
+
+def get_suggestions(query):
+    """Return the autocomplete payload for a raw search box query"""
+    normalized = normalize_query(query)
+    key = versioned_key('suggestions', SUGGESTION_SECTIONS, normalized)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    products = (
+        Product.objects
+        .filter(is_active=True, name__icontains=normalized)
+        .annotate(
+            prefix_match=Case(
+                When(name__istartswith=normalized, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by('prefix_match', 'name')
+        .values('id', 'name', 'slug', 'sku')[:10]
+    )
+
+    _, category_version, brand_version = get_versions(*SUGGESTION_SECTIONS)
+    result = {
+        'products': list(products),
+        'categories': _category_index.get(category_version).lookup(normalized, 5),
+        'brands': _brand_index.get(brand_version).lookup(normalized, 5),
+    }
+    cache.set(key, result, SUGGESTION_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,289 @@
+"""
+Deterministic synthetic catalog generator for load tests and benchmarks
+
+Rows are produced by generators and written with bulk_create in fixed-size
+batches, so memory stays flat regardless of volume; the only state kept for
+the whole run is an array of generated product ids (8 bytes per product)
+used to pick order lines. The same seed and prefix always produce the same
+catalog.
+"""
+import random
+from array import array
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .cache import bump_versions
+from .ledger import record_movements
+from .models import (
+    Brand, Category, Product, ProductImage, ProductReview, StockMovement,
+    TechnicalSpecification, Warehouse, WarehouseStock
+)
+from .search import invalidate_index
+from .services import reconcile_product_counts, refresh_product_ratings
+from .signals import delete_receivers_muted
+from .stock import reconcile_stock, rollup_product_stock
+
+User = get_user_model()
+
+PRODUCT_NOUNS = [
+    'Drill', 'Impact Driver', 'Angle Grinder', 'Circular Saw', 'Jigsaw', 'Hammer', 'Wrench Set',
+    'Socket Set', 'Pliers', 'Screwdriver Set', 'Pipe Wrench', 'PVC Pipe', 'Ball Valve', 'Cable',
+    'Circuit Breaker', 'LED Floodlight', 'Cement Bag', 'Iron Rod', 'Roofing Sheet', 'Safety Helmet',
+    'Work Gloves', 'Ladder', 'Wheelbarrow', 'Paint Roller', 'Tile Cutter', 'Measuring Tape',
+]
+PRODUCT_ADJECTIVES = [
+    'Cordless', 'Heavy-Duty', 'Professional', 'Compact', 'Industrial', 'Brushless', 'Galvanized',
+    'Stainless', 'Insulated', 'Waterproof', 'Rechargeable', 'Adjustable',
+]
+SPEC_TEMPLATES = [
+    ('Voltage', 'voltage', ['12V', '18V', '20V', '220V', '240V']),
+    ('Material', 'material', ['Steel', 'Stainless Steel', 'PVC', 'Aluminium', 'Copper']),
+    ('Size', 'size', ['1/2"', '3/4"', '1"', '10mm', '25mm', '50mm']),
+    ('Power', 'power', ['500W', '750W', '1200W', '2000W']),
+    ('Weight', 'weight', ['0.5kg', '1.2kg', '2.5kg', '5kg', '25kg']),
+    ('Capacity', 'capacity', ['10L', '20L', '50L', '100L']),
+]
+
+DELETE_BATCH_SIZE = 1000
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class CatalogGenerator:
+    def __init__(self, *, seed=42, prefix='gen', batch_size=2000, log=None):
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.product_ids = array('q')
+
+    # Reference data -----------------------------------------------------
+
+    def create_categories(self, count):
+        """A forest of roughly count/5 roots with children up to three levels deep"""
+        roots = max(1, count // 5)
+        categories = []
+        for i in range(count):
+            parent = None if i < roots else self.rng.choice(categories[: max(roots, i // 2)])
+            category = Category.objects.create(
+                name=f'{self.prefix.title()} Category {i}',
+                slug=f'{self.prefix}-category-{i}',
+                description='Synthetic category',
+                parent=parent,
+            )
+            categories.append(category)
+        self.log(f'Created {len(categories)} categories')
+        return categories
+
+    def create_brands(self, count):
+        brands = Brand.objects.bulk_create([
+            Brand(name=f'{self.prefix.title()} Brand {i}', slug=f'{self.prefix}-brand-{i}', description='Synthetic brand')
+            for i in range(count)
+        ], batch_size=self.batch_size)
+        self.log(f'Created {len(brands)} brands')
+        return brands
+
+    def create_warehouses(self, count):
+        warehouses = Warehouse.objects.bulk_create([
+            Warehouse(
+                name=f'{self.prefix.title()} Warehouse {i}', code=f'{self.prefix[:5].upper()}{i}'[:10],
+                address='Synthetic warehouse', phone='+233000000000',
+            )
+            for i in range(count)
+        ])
+        self.log(f'Created {len(warehouses)} warehouses')
+        return warehouses
+
+    def create_users(self, count):
+        created = 0
+        for batch in batched(
+            (User(username=f'{self.prefix}-user-{i}', email=f'{self.prefix}-user-{i}@example.com', password='!')
+             for i in range(count)),
+            self.batch_size,
+        ):
+            User.objects.bulk_create(batch)
+            created += len(batch)
+        self.log(f'Created {created} users')
+        return list(User.objects.filter(username__startswith=f'{self.prefix}-user-').values_list('pk', flat=True))
+
+    # Products -------------------------------------------------------------
+
+    def _product_stream(self, count, categories, brands):
+        rng = self.rng
+        for i in range(count):
+            noun = rng.choice(PRODUCT_NOUNS)
+            adjective = rng.choice(PRODUCT_ADJECTIVES)
+            brand = rng.choice(brands)
+            price = Decimal(rng.randrange(500, 500_000)) / 100
+            yield Product(
+                name=f'{brand.name} {adjective} {noun} {i}',
+                slug=f'{self.prefix}-product-{i}',
+                sku=f'{self.prefix.upper()}-{i:08d}',
+                description=f'{adjective} {noun.lower()} for construction and home improvement. Synthetic item {i}.',
+                short_description=f'{adjective} {noun.lower()}',
+                category=rng.choice(categories),
+                brand=brand,
+                price=price,
+                compare_price=price * Decimal('1.15') if rng.random() < 0.2 else None,
+                condition=rng.choices(['new', 'refurbished', 'used'], weights=[90, 7, 3])[0],
+                track_stock=rng.random() > 0.05,
+                stock_quantity=rng.choice([0, 0, 3, 10, 50, 200]),
+                is_active=rng.random() > 0.05,
+                is_featured=rng.random() < 0.02,
+            )
+
+    def create_products(self, count, *, categories, brands, warehouses, user_ids,
+                        images_per_product=2, specs_per_product=3, reviews_per_product=1.0):
+        created = 0
+        for batch in batched(self._product_stream(count, categories, brands), self.batch_size):
+            with transaction.atomic():
+                products = Product.objects.bulk_create(batch)
+                self.product_ids.extend(product.pk for product in products)
+                self._create_children(
+                    products, warehouses, user_ids,
+                    images_per_product, specs_per_product, reviews_per_product,
+                )
+            created += len(products)
+            self.log(f'Created {created}/{count} products')
+        return created
+
+    def _create_children(self, products, warehouses, user_ids, images_per_product, specs_per_product, reviews_per_product):
+        rng = self.rng
+        images, specs, stock, reviews = [], [], [], []
+        for product in products:
+            for position in range(images_per_product):
+                images.append(ProductImage(
+                    product=product, image=f'https://picsum.photos/seed/{product.sku}-{position}/600/600',
+                    alt_text=product.name, is_primary=position == 0, sort_order=position,
+                ))
+            spec_count = min(specs_per_product, len(SPEC_TEMPLATES))
+            for position, (label, spec_type, values) in enumerate(rng.sample(SPEC_TEMPLATES, spec_count)):
+                specs.append(TechnicalSpecification(
+                    product=product, label=label, value=rng.choice(values), spec_type=spec_type, sort_order=position,
+                ))
+            if product.track_stock and warehouses:
+                for warehouse in warehouses:
+                    quantity = rng.choice([0, 0, 2, 5, 10, 25, 100])
+                    stock.append(WarehouseStock(product=product, warehouse=warehouse, quantity=quantity))
+            if user_ids:
+                review_count = int(rng.expovariate(1 / reviews_per_product)) if reviews_per_product else 0
+                review_count = min(review_count, len(user_ids))
+                for user_id in rng.sample(user_ids, review_count):
+                    reviews.append(ProductReview(
+                        product=product, user_id=user_id, rating=rng.choices([1, 2, 3, 4, 5], weights=[5, 5, 15, 35, 40])[0],
+                        title='Synthetic review', content='Generated for load testing.', is_verified=rng.random() < 0.5,
+                    ))
+
+        ProductImage.objects.bulk_create(images)
+        TechnicalSpecification.objects.bulk_create(specs)
+        WarehouseStock.objects.bulk_create(stock)
+        ProductReview.objects.bulk_create(reviews)
+
+        # bulk_create skips signals, so keep the denormalized columns and the ledger right here
+        if stock:
+            rollup_product_stock({row.product_id for row in stock})
+            record_movements(
+                StockMovement(
+                    product_id=row.product_id, warehouse_id=row.warehouse_id, kind='receipt',
+                    quantity=row.quantity, reference=f'{self.prefix} synthetic',
+                )
+                for row in stock
+            )
+        if reviews:
+            refresh_product_ratings({review.product_id for review in reviews})
+
+    # Orders -----------------------------------------------------------------
+
+    def create_orders(self, count, *, user_ids, max_items=5):
+        from apps.orders.models import Order, OrderItem, OrderStatusUpdate
+
+        if not self.product_ids:
+            return 0
+
+        rng = self.rng
+        statuses = ['pending', 'confirmed', 'processing', 'shipped', 'delivered', 'cancelled']
+        created = 0
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            lines_per_order = [
+                [(rng.choice(self.product_ids), rng.randint(1, 4)) for _ in range(rng.randint(1, max_items))]
+                for _ in range(size)
+            ]
+            products = Product.objects.in_bulk({pid for lines in lines_per_order for pid, _ in lines})
+
+            with transaction.atomic():
+                orders = []
+                for offset, lines in enumerate(lines_per_order):
+                    number = start + offset
+                    orders.append(Order(
+                        order_number=f'{self.prefix.upper()}-ORD-{number:08d}',
+                        user_id=rng.choice(user_ids) if user_ids and rng.random() < 0.7 else None,
+                        first_name='Synthetic', last_name=f'Customer {number}',
+                        email=f'{self.prefix}-customer-{number}@example.com', phone='+233200000000',
+                        shipping_address=f'{number} Synthetic Street', city=rng.choice(['Accra', 'Tema', 'Kumasi']),
+                        region='Greater Accra',
+                        total_amount=sum(products[pid].price * quantity for pid, quantity in lines),
+                        payment_method=rng.choice(['cod', 'mobile_money', 'card']),
+                        status=rng.choice(statuses),
+                    ))
+                Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order, product_id=pid, product_name=products[pid].name,
+                        product_sku=products[pid].sku, price=products[pid].price, quantity=quantity,
+                    )
+                    for order, lines in zip(orders, lines_per_order)
+                    for pid, quantity in lines
+                ])
+                OrderStatusUpdate.objects.bulk_create([
+                    OrderStatusUpdate(order=order, status=order.status, notes='Synthetic order')
+                    for order in orders
+                ])
+            created += size
+            self.log(f'Created {created}/{count} orders')
+        return created
+
+    def finish(self):
+        """Fix up counters bulk_create skipped and invalidate catalog caches"""
+        reconcile_product_counts()
+        bump_versions('products', 'categories', 'brands', 'warehouses')
+        invalidate_index()
+
+
+def delete_in_batches(queryset, batch_size=DELETE_BATCH_SIZE) -> int:
+    """Delete the queryset batch_size pks at a time, so no single delete collects the whole table"""
+    deleted = 0
+    while pks := list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size]):
+        queryset.model.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+    return deleted
+
+
+def delete_generated(prefix, batch_size=DELETE_BATCH_SIZE):
+    """
+    Remove everything a previous run with this prefix created
+
+    Rows are deleted in pk batches with the per-row delete receivers muted;
+    counts, stock rollups and caches are reconciled once at the end.
+    """
+    from apps.orders.models import Order
+
+    with delete_receivers_muted():
+        # Orders first: their warehouse allocations protect the warehouses
+        delete_in_batches(Order.objects.filter(order_number__startswith=f'{prefix.upper()}-ORD-'), batch_size)
+        delete_in_batches(Product.objects.filter(slug__startswith=f'{prefix}-product-'), batch_size)
+        delete_in_batches(Category.objects.filter(slug__startswith=f'{prefix}-category-'), batch_size)
+        delete_in_batches(Brand.objects.filter(slug__startswith=f'{prefix}-brand-'), batch_size)
+        delete_in_batches(Warehouse.objects.filter(name__startswith=f'{prefix.title()} Warehouse '), batch_size)
+        delete_in_batches(User.objects.filter(username__startswith=f'{prefix}-user-'), batch_size)
+    reconcile_product_counts()
+    reconcile_stock()
+    bump_versions('products', 'categories', 'brands', 'warehouses')
+    invalidate_index()
@@ -0,0 +1,252 @@
+"""
+Catalog tests: behaviour of stock, sync, import/export and conditional GETs,
+and query budgets for the public endpoints
+
+Budgets are SQL statements per request with a cold cache; max_repeats=1
+fails as soon as any statement runs once per row (an N+1 regression).
+"""
+import base64
+import io
+import json
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.core.testing import PASSWORD, CatalogTestCase, User
+from apps.products.bulk import SyncError, export_ndjson, import_products, sync_prices_and_stock
+from apps.products.ledger import ledger_drift
+from apps.products.models import Product, StockMovement, WarehouseStock
+from apps.products.services import sync_specifications
+from apps.products.stock import (
+    InsufficientStock, reserve_stock, rollup_product_stock, upsert_warehouse_stock
+)
+
+
+class StockTestCase(CatalogTestCase):
+    def setUp(self):
+        self.tracked = Product.objects.filter(track_stock=True, is_active=True).order_by('pk').first()
+        self.first, self.second = self.warehouses
+
+    def set_levels(self, first, second):
+        upsert_warehouse_stock({(self.tracked.pk, self.first.pk): first, (self.tracked.pk, self.second.pk): second})
+        rollup_product_stock([self.tracked.pk])
+        self.tracked.refresh_from_db()
+
+    def levels(self):
+        return dict(
+            WarehouseStock.objects.filter(product=self.tracked).values_list('warehouse_id', 'quantity')
+        )
+
+
+class ReserveStockTests(StockTestCase):
+    def test_allocates_from_the_fullest_warehouse_first(self):
+        self.set_levels(3, 5)
+        allocations = reserve_stock([(self.tracked, 6)], reference='TEST-1')
+
+        self.assertEqual(allocations, [[(self.second.pk, 5), (self.first.pk, 1)]])
+        self.assertEqual(self.levels(), {self.first.pk: 2, self.second.pk: 0})
+        self.tracked.refresh_from_db()
+        self.assertEqual(self.tracked.stock_quantity, 2)
+        sales = StockMovement.objects.filter(product=self.tracked, kind='sale', reference='TEST-1')
+        self.assertEqual(sum(sales.values_list('quantity', flat=True)), -6)
+        self.assertEqual(ledger_drift(), [])
+
+    def test_rejects_an_oversell_without_touching_stock(self):
+        self.set_levels(3, 5)
+        with self.assertRaises(InsufficientStock) as raised:
+            reserve_stock([(self.tracked, 9)])
+
+        self.assertEqual((raised.exception.requested, raised.exception.available), (9, 8))
+        self.assertEqual(self.levels(), {self.first.pk: 3, self.second.pk: 5})
+        self.assertEqual(ledger_drift(), [])
+
+
+class PriceStockSyncTests(StockTestCase):
+    def test_applies_prices_and_warehouse_stock(self):
+        self.set_levels(3, 5)
+        result = sync_prices_and_stock([
+            {'sku': self.tracked.sku, 'price': '12.50'},
+            {'sku': self.tracked.sku, 'warehouse_code': self.first.code, 'quantity': 7},
+        ])
+
+        self.assertEqual(result, {'products': 1, 'warehouse_rows': 1})
+        self.tracked.refresh_from_db()
+        self.assertEqual(self.tracked.price, Decimal('12.50'))
+        self.assertEqual(self.levels(), {self.first.pk: 7, self.second.pk: 5})
+        self.assertEqual(self.tracked.stock_quantity, 12)
+        self.assertEqual(ledger_drift(), [])
+
+    def test_one_invalid_item_rejects_the_whole_batch(self):
+        price = self.tracked.price
+        with self.assertRaises(SyncError) as raised:
+            sync_prices_and_stock([
+                {'sku': self.tracked.sku, 'price': '1.00'},
+                {'sku': 'NO-SUCH-SKU', 'price': '2.00'},
+                {'sku': self.tracked.sku, 'warehouse_code': 'NOPE', 'quantity': 1},
+            ])
+
+        self.assertEqual([error['index'] for error in raised.exception.errors], [1, 2])
+        self.tracked.refresh_from_db()
+        self.assertEqual(self.tracked.price, price)
+
+
+class SpecificationSyncTests(CatalogTestCase):
+    def test_only_changed_specs_are_written(self):
+        specs = list(self.product.specifications.order_by('sort_order').values('label', 'value', 'spec_type'))
+        pks = list(self.product.specifications.order_by('sort_order').values_list('pk', flat=True))
+
+        self.assertEqual(sync_specifications({self.product.pk: specs}), {'created': 0, 'updated': 0, 'deleted': 0})
+
+        specs[0]['value'] = 'Changed'
+        specs[-1:] = [{'label': 'Finish', 'value': 'Matte', 'spec_type': 'other'}]
+        self.assertEqual(sync_specifications({self.product.pk: specs}), {'created': 1, 'updated': 1, 'deleted': 1})
+        self.assertEqual(
+            list(self.product.specifications.order_by('sort_order').values_list('pk', flat=True))[:-1], pks[:-1],
+        )
+
+
+class ImportExportTests(CatalogTestCase):
+    def test_export_round_trips_through_import(self):
+        queryset = Product.objects.filter(pk=self.product.pk)
+        row = json.loads(''.join(export_ndjson(queryset)))
+        spec_pks = set(self.product.specifications.values_list('pk', flat=True))
+        image_pks = set(self.product.images.values_list('pk', flat=True))
+
+        row['price'] = '999.99'
+        result = import_products(io.StringIO(json.dumps(row) + '\n'), 'ndjson')
+
+        self.assertEqual((result.created, result.updated, result.failed), (0, 1, 0), result.errors)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal('999.99'))
+        # Unchanged children are matched, not recreated
+        self.assertEqual(set(self.product.specifications.values_list('pk', flat=True)), spec_pks)
+        self.assertEqual(set(self.product.images.values_list('pk', flat=True)), image_pks)
+        self.assertEqual(json.loads(''.join(export_ndjson(queryset)))['specifications'], row['specifications'])
+        self.assertEqual(ledger_drift(), [])
+
+    @override_settings(PRODUCT_IMPORT_MAX_ROWS=2)
+    def test_http_import_refuses_files_over_the_row_cap(self):
+        staff = User.objects.create_user('import-staff', password=PASSWORD, is_staff=True)
+        token = str(RefreshToken.for_user(staff).access_token)
+        rows = ''.join(json.dumps({'sku': f'CAP-{i}', 'price': '1.00'}) + '\n' for i in range(4))
+
+        response = self.client.post(
+            '/api/products/import/', {'file': SimpleUploadedFile('rows.ndjson', rows.encode())},
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('import_products', response.json()['error'])
+        self.assertFalse(Product.objects.filter(sku__startswith='CAP-').exists())
+
+    def test_incomplete_specs_are_reported_not_raised(self):
+        line = json.dumps({'sku': self.product.sku, 'specifications': [{'label': 'Voltage'}]})
+        result = import_products(io.StringIO(line + '\n'), 'ndjson')
+
+        self.assertEqual((result.updated, result.failed), (0, 1))
+        self.assertIn('specifications', result.errors[0]['errors'])
+
+
+class CursorPaginationTests(CatalogTestCase):
+    def test_next_links_walk_every_product_once(self):
+        pages, ids = self.follow_pages('/api/products/?pagination=cursor&page_size=7')
+
+        expected = list(Product.objects.filter(is_active=True).order_by('-created_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, -(-len(expected) // 7))
+
+    def test_tampered_cursor_is_a_404(self):
+        for raw in (b'2024-01-01T00:00:00+00:00|abc', b'2024-13-45T00:00:00|1', b'garbage'):
+            cursor = base64.urlsafe_b64encode(raw).decode()
+            response = self.client.get(f'/api/products/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404, raw)
+
+
+class SearchTests(CatalogTestCase):
+    def search(self, term):
+        response = self.client.get('/api/products/', {'search': term, 'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        return [result['id'] for result in response.json()['results']]
+
+    def test_hyphenated_sku_is_found_as_typed(self):
+        Product.objects.filter(pk=self.product.pk).update(sku='DW-123')
+
+        self.assertIn(self.product.pk, self.search('DW-123'))
+        self.assertIn(self.product.pk, self.search('dw-12'))
+
+    def test_name_words_are_prefix_matched(self):
+        word = self.product.name.split()[-2]
+
+        self.assertIn(self.product.pk, self.search(word[:4]))
+
+
+class ConditionalGetTests(CatalogTestCase):
+    def test_product_detail_returns_304_until_the_product_changes(self):
+        path = f'/api/products/{self.product.slug}/'
+        etag = self.client.get(path)['ETag']
+
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Product.objects.filter(pk=self.product.pk).update(updated_at=timezone.now())
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_product_list_returns_304_for_a_matching_etag(self):
+        etag = self.client.get('/api/products/')['ETag']
+
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+
+
+class CatalogQueryBudgetTests(CatalogTestCase):
+    def test_product_list(self):
+        self.assertEndpointBudget('GET', '/api/products/', 3)
+
+    def test_product_list_filtered(self):
+        # +1 to resolve the category subtree when the cached category rows are cold
+        self.assertEndpointBudget(
+            'GET', f'/api/products/?category_slug={self.product.category.slug}&ordering=-price&min_price=1', 4,
+        )
+
+    def test_product_list_search(self):
+        self.assertEndpointBudget('GET', '/api/products/?search=drill', 4)
+
+    def test_product_list_cursor(self):
+        self.assertEndpointBudget('GET', '/api/products/?pagination=cursor', 2)
+
+    def test_product_detail(self):
+        self.assertEndpointBudget('GET', f'/api/products/{self.product.slug}/', 6)
+
+    def test_featured_products(self):
+        self.assertEndpointBudget('GET', '/api/products/featured/', 2)
+
+    def test_search_suggestions(self):
+        self.assertEndpointBudget('GET', '/api/products/search/?q=dri', 3)
+
+    def test_categories(self):
+        self.assertEndpointBudget('GET', '/api/products/categories/', 1)
+
+    def test_category_tree(self):
+        self.assertEndpointBudget('GET', '/api/products/categories/tree/', 1)
+
+    def test_brands(self):
+        self.assertEndpointBudget('GET', '/api/products/brands/', 1)
+
+    def test_warehouses(self):
+        self.assertEndpointBudget('GET', '/api/products/warehouses/', 1)
+
+    def test_category_products(self):
+        # Section header and category subtree lookups, then count, page and images
+        self.assertEndpointBudget('GET', f'/api/products/categories/{self.product.category.slug}/', 5)
+
+    def test_brand_products(self):
+        self.assertEndpointBudget('GET', f'/api/products/brands/{self.product.brand.slug}/', 4)
+
+    def test_product_reviews(self):
+        self.assertEndpointBudget('GET', f'/api/products/{self.product.pk}/reviews/', 1)
@@ -0,0 +1,68 @@
+"""
+Category hierarchy served from one cached query
+
+All categories are read in a single query ordered by materialized path and
+kept in the cache until a category changes or product counts move. The
+nested tree for /categories/tree/ and the descendant ids behind
+descendant-inclusive `category_slug` filtering are both derived from it.
+"""
+from django.core.cache import cache
+
+from .cache import CATALOG_CACHE_TIMEOUT, versioned_key
+from .models import Category
+
+TREE_SECTIONS = ('categories', 'products')
+NODE_FIELDS = (
+    'id', 'name', 'slug', 'description', 'image', 'parent_id', 'path', 'depth', 'is_active',
+    'active_product_count', 'total_product_count',
+)
+
+
+def category_rows():
+    key = versioned_key('category-rows', TREE_SECTIONS)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(Category.objects.order_by('path').values(*NODE_FIELDS))
+        cache.set(key, rows, CATALOG_CACHE_TIMEOUT)
+    return rows
+
+
+def build_tree(rows, active_only=True):
+    """Nest path-ordered rows; children of inactive categories are left out with them"""
+    roots, nodes = [], {}
+    for row in rows:
+        if active_only and not row['is_active']:
+            continue
+        node = {
+            'id': row['id'], 'name': row['name'], 'slug': row['slug'],
+            'description': row['description'], 'image': row['image'], 'depth': row['depth'],
+            'active_product_count': row['active_product_count'],
+            'total_product_count': row['total_product_count'],
+            'children': [],
+        }
+        nodes[row['id']] = node
+        if row['parent_id'] is None:
+            roots.append(node)
+        elif row['parent_id'] in nodes:
+            nodes[row['parent_id']]['children'].append(node)
+
+    def sort(children):
+        children.sort(key=lambda node: node['name'])
+        for child in children:
+            sort(child['children'])
+
+    sort(roots)
+    return roots
+
+
+def get_category_tree():
+    return build_tree(category_rows())
+
+
+def descendant_ids(slug):
+    """Ids of the category with this slug and everything below it (None if unknown)"""
+    rows = category_rows()
+    path = next((row['path'] for row in rows if row['slug'] == slug), None)
+    if path is None:
+        return None
+    return [row['id'] for row in rows if row['path'].startswith(path)]
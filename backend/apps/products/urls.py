@@ -6,11 +6,12 @@ app_name = 'products'
 urlpatterns = [
     # Category endpoints (must come before slug-based routes)
     path('categories/', views.product_categories, name='category-list'),
-    path('categories/<slug:slug>/', views.category_products, name='category-products'),
+    path('categories/tree/', views.category_tree, name='category-tree'),
+    path('categories/<slug:slug>/', views.CategoryProductListView.as_view(), name='category-products'),
     
     # Brand endpoints (must come before slug-based routes)
     path('brands/', views.product_brands, name='brand-list'),
-    path('brands/<slug:slug>/', views.brand_products, name='brand-products'),
+    path('brands/<slug:slug>/', views.BrandProductListView.as_view(), name='brand-products'),
     
     # Warehouse endpoints
     path('warehouses/', views.warehouses, name='warehouse-list'),
@@ -23,11 +24,15 @@ urlpatterns = [
     # Product management (admin only) - MUST come before slug patterns
     path('create/', views.ProductCreateView.as_view(), name='product-create'),
     path('upload-image/', views.upload_product_image, name='upload-product-image'),
+    path('import/', views.import_products_view, name='product-import'),
+    path('export/', views.export_products_view, name='product-export'),
+    path('bulk-update/', views.bulk_price_stock_update, name='product-bulk-update'),
     
     # Product detail (must come after specific routes)
     path('<slug:slug>/', views.ProductDetailView.as_view(), name='product-detail'),
     path('<slug:slug>/update/', views.ProductUpdateView.as_view(), name='product-update'),
     path('<slug:slug>/delete/', views.ProductDeleteView.as_view(), name='product-delete'),
+    path('<slug:slug>/stock-movements/', views.StockMovementListView.as_view(), name='stock-movements'),
     
     # Reviews
     path('<int:product_id>/reviews/', views.ProductReviewListCreateView.as_view(), name='review-list'),
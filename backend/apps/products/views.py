@@ -5,36 +5,53 @@ from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db import models
-from django.db.models import Q, Avg, Count
+from django.db.models import Q, Avg
+from django.core.cache import cache
 from django.core.files.storage import default_storage
+from django.http import StreamingHttpResponse
 from django.conf import settings
 import os
 import uuid
-from .models import Product, Category, Brand, Warehouse, ProductReview
+from apps.core.pagination import KeysetOptInMixin
+from apps.core.streaming import StreamingListMixin
+from .models import Product, Category, Brand, Warehouse, ProductReview, StockMovement
+from .bulk import (
+    CONTENT_TYPES as BULK_CONTENT_TYPES, EXPORTERS, READERS, SyncError, count_lines, detect_format,
+    import_products, sync_prices_and_stock,
+)
+from .cache import CATALOG_CACHE_TIMEOUT, cache_catalog_response, versioned_key
+from .conditional import ConditionalGetMixin, product_detail_etag
+from .ledger import stock_levels
+from .search import ProductSearchFilter
+from .suggestions import get_suggestions
+from .tree import descendant_ids, get_category_tree
 from .serializers import (
     ProductListSerializer, ProductDetailSerializer, ProductCreateUpdateSerializer,
-    CategorySerializer, BrandSerializer, WarehouseSerializer, ProductReviewSerializer
+    CategorySerializer, BrandSerializer, WarehouseSerializer, ProductReviewSerializer,
+    StockMovementSerializer
 )
 
-class ProductPagination(pagination.PageNumberPagination):
-    """Custom pagination for products"""
+class ProductPagination(KeysetOptInMixin, pagination.PageNumberPagination):
+    """Custom pagination for products (`pagination=cursor` for keyset pages)"""
     page_size = 12
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class ProductListView(generics.ListAPIView):
-    """List all products with filtering and search"""
-    queryset = Product.objects.filter(is_active=True)
+class ProductListView(ConditionalGetMixin, StreamingListMixin, generics.ListAPIView):
+    """List all products with filtering and search (staff: `stream=1|ndjson` for the full result)"""
+    queryset = Product.objects.filter(is_active=True).with_list_relations()
     serializer_class = ProductListSerializer
     pagination_class = ProductPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # Search runs last so it can order by relevance when no ordering is requested
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ProductSearchFilter]
     filterset_fields = ['category', 'brand', 'condition', 'is_featured']
     search_fields = ['name', 'description', 'short_description', 'sku', 'brand__name']
-    ordering_fields = ['price', 'created_at', 'name', 'stock_quantity']
+    ordering_fields = ['price', 'created_at', 'name', 'stock_quantity', 'rating']
     ordering = ['-created_at']
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # Expose the maintained average under the public `ordering=rating` name
+        queryset = super().get_queryset().alias(rating=models.F('rating_average'))
         
         # Stock filtering
         in_stock = self.request.query_params.get('in_stock')
@@ -51,10 +68,14 @@ class ProductListView(generics.ListAPIView):
         if max_price:
             queryset = queryset.filter(price__lte=max_price)
         
-        # Category filtering by slug
+        # Category filtering by slug, including subcategories unless
+        # include_subcategories=false
         category_slug = self.request.query_params.get('category_slug')
         if category_slug:
-            queryset = queryset.filter(category__slug=category_slug)
+            if self.request.query_params.get('include_subcategories') == 'false':
+                queryset = queryset.filter(category__slug=category_slug)
+            else:
+                queryset = queryset.filter(category_id__in=descendant_ids(category_slug) or [])
         
         # Brand filtering by slug
         brand_slug = self.request.query_params.get('brand_slug')
@@ -63,12 +84,15 @@ class ProductListView(generics.ListAPIView):
         
         return queryset
 
-class ProductDetailView(generics.RetrieveAPIView):
+class ProductDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Get product details"""
-    queryset = Product.objects.filter(is_active=True)
+    queryset = Product.objects.filter(is_active=True).with_detail_relations()
     serializer_class = ProductDetailSerializer
     lookup_field = 'slug'
 
+    def get_etag(self, request):
+        return product_detail_etag(self.get_queryset(), self.kwargs['slug'])
+
 class ProductCreateView(generics.CreateAPIView):
     """Create new product (admin only)"""
     queryset = Product.objects.all()
@@ -82,6 +106,31 @@ class ProductUpdateView(generics.UpdateAPIView):
     permission_classes = [IsAdminUser]
     lookup_field = 'slug'
 
+class StockMovementPagination(pagination.PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+class StockMovementListView(generics.ListAPIView):
+    """Stock ledger of a product, newest first, with its per-warehouse levels (admin only)"""
+    serializer_class = StockMovementSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = StockMovementPagination
+
+    def get_queryset(self):
+        self.product = generics.get_object_or_404(Product, slug=self.kwargs['slug'])
+        return StockMovement.objects.filter(product=self.product).select_related('warehouse').order_by('-id')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        levels = stock_levels([self.product.pk])
+        codes = dict(Warehouse.objects.filter(pk__in=[pk for _, pk in levels]).values_list('pk', 'code'))
+        response.data = {
+            'levels': {codes[warehouse_id]: quantity for (_, warehouse_id), quantity in levels.items()},
+            **response.data,
+        }
+        return response
+
 class ProductDeleteView(generics.DestroyAPIView):
     """Delete product (admin only)"""
     queryset = Product.objects.all()
@@ -95,101 +144,111 @@ def product_search_suggestions(request):
     if not query or len(query) < 2:
         return Response({'suggestions': []})
     
-    # Search products
-    products = Product.objects.filter(
-        is_active=True,
-        name__icontains=query
-    ).values('id', 'name', 'slug', 'sku')[:10]
-    
-    # Search categories
-    categories = Category.objects.filter(
-        is_active=True,
-        name__icontains=query
-    ).values('id', 'name', 'slug')[:5]
-    
-    # Search brands
-    brands = Brand.objects.filter(
-        is_active=True,
-        name__icontains=query
-    ).values('id', 'name', 'slug')[:5]
-    
-    return Response({
-        'products': list(products),
-        'categories': list(categories),
-        'brands': list(brands)
-    })
+    return Response(get_suggestions(query))
 
 @api_view(['GET'])
+@cache_catalog_response('featured', ('products', 'categories', 'brands'))
 def featured_products(request):
     """Get featured products"""
-    products = Product.objects.filter(is_active=True, is_featured=True)[:12]
+    products = Product.objects.filter(is_active=True, is_featured=True).with_list_relations()[:12]
     serializer = ProductListSerializer(products, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
+@cache_catalog_response('categories', ('categories', 'products'))
 def product_categories(request):
     """Get all categories with product counts"""
-    categories = Category.objects.filter(is_active=True).annotate(
-        product_count=Count('products', filter=Q(products__is_active=True))
-    ).order_by('name')
+    categories = Category.objects.filter(is_active=True).order_by('name')
     serializer = CategorySerializer(categories, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
+def category_tree(request):
+    """Get the full category hierarchy with product counts"""
+    return Response(get_category_tree())
+
+@api_view(['GET'])
+@cache_catalog_response('brands', ('brands', 'products'))
 def product_brands(request):
     """Get all brands with product counts"""
-    brands = Brand.objects.filter(is_active=True).annotate(
-        product_count=Count('products', filter=Q(products__is_active=True))
-    ).order_by('name')
+    brands = Brand.objects.filter(is_active=True).order_by('name')
     serializer = BrandSerializer(brands, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
+@cache_catalog_response('warehouses', ('warehouses',))
 def warehouses(request):
     """Get all warehouses"""
     warehouses = Warehouse.objects.filter(is_active=True)
     serializer = WarehouseSerializer(warehouses, many=True)
     return Response(serializer.data)
 
-@api_view(['GET'])
-def category_products(request, slug):
-    """Get products by category"""
-    try:
-        category = Category.objects.get(slug=slug, is_active=True)
-        products = Product.objects.filter(is_active=True, category=category)
-        
-        # Apply same filtering as ProductListView
-        filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-        for backend in filter_backends:
-            products = backend().filter_queryset(request, products, self)
-        
-        serializer = ProductListSerializer(products, many=True)
-        return Response({
-            'category': CategorySerializer(category).data,
-            'products': serializer.data
-        })
-    except Category.DoesNotExist:
-        return Response({'error': 'Category not found'}, status=404)
+class SectionProductListView(ProductListView):
+    """
+    ProductListView scoped to one category or brand, with that section's
+    header (served from cache) in front of the paginated products
+    """
+    section_model = None
+    section_serializer_class = None
+    section_key = None
+    section_version = None
+    section_filter_field = None  # Product column holding the section id
 
-@api_view(['GET'])
-def brand_products(request, slug):
+    def get_section(self, slug):
+        key = versioned_key(f'{self.section_key}-header', (self.section_version, 'products'), slug)
+        data = cache.get(key)
+        if data is None:
+            instance = self.section_model.objects.filter(slug=slug, is_active=True).first()
+            if instance is None:
+                return None
+            data = self.section_serializer_class(instance).data
+            cache.set(key, data, CATALOG_CACHE_TIMEOUT)
+        return data
+
+    def filter_section(self, queryset):
+        return queryset.filter(**{self.section_filter_field: self.section['id']})
+
+    def get_queryset(self):
+        return self.filter_section(super().get_queryset())
+
+    def get(self, request, *args, **kwargs):
+        self.section = self.get_section(kwargs['slug'])
+        if self.section is None:
+            return Response({'error': f'{self.section_key.title()} not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        response = super().get(request, *args, **kwargs)
+        # Streamed exports (stream=1) are plain product rows without the header
+        if response.status_code == status.HTTP_200_OK and isinstance(response, Response):
+            page = response.data
+            response.data = {
+                self.section_key: self.section,
+                'count': page.get('count'),
+                'next': page.get('next'),
+                'previous': page.get('previous'),
+                'products': page['results'],
+            }
+        return response
+
+class CategoryProductListView(SectionProductListView):
+    """Get products by category (including subcategories unless include_subcategories=false)"""
+    section_model = Category
+    section_serializer_class = CategorySerializer
+    section_key = 'category'
+    section_version = 'categories'
+    section_filter_field = 'category_id'
+
+    def filter_section(self, queryset):
+        if self.request.query_params.get('include_subcategories') == 'false':
+            return super().filter_section(queryset)
+        return queryset.filter(category_id__in=descendant_ids(self.section['slug']) or [self.section['id']])
+
+class BrandProductListView(SectionProductListView):
     """Get products by brand"""
-    try:
-        brand = Brand.objects.get(slug=slug, is_active=True)
-        products = Product.objects.filter(is_active=True, brand=brand)
-        
-        # Apply same filtering as ProductListView
-        filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-        for backend in filter_backends:
-            products = backend().filter_queryset(request, products, self)
-        
-        serializer = ProductListSerializer(products, many=True)
-        return Response({
-            'brand': BrandSerializer(brand).data,
-            'products': serializer.data
-        })
-    except Brand.DoesNotExist:
-        return Response({'error': 'Brand not found'}, status=404)
+    section_model = Brand
+    section_serializer_class = BrandSerializer
+    section_key = 'brand'
+    section_version = 'brands'
+    section_filter_field = 'brand_id'
 
 class ProductReviewListCreateView(generics.ListCreateAPIView):
     """List and create product reviews"""
@@ -200,7 +259,7 @@ class ProductReviewListCreateView(generics.ListCreateAPIView):
         return ProductReview.objects.filter(
             product_id=product_id, 
             is_approved=True
-        ).order_by('-created_at')
+        ).select_related('user').order_by('-created_at')
     
     def perform_create(self, serializer):
         product_id = self.kwargs['product_id']
@@ -305,3 +364,68 @@ def upload_product_image(request):
             {'error': f'Upload failed: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser, FormParser])
+def import_products_view(request):
+    """
+    Bulk create/update products by SKU from an uploaded CSV or NDJSON file
+    (`file`; optional `file_format` and `dry_run`). The import runs inside the
+    request, so files over PRODUCT_IMPORT_MAX_ROWS are refused with 413 and
+    have to be loaded with `manage.py import_products`.
+    """
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_rows = settings.PRODUCT_IMPORT_MAX_ROWS
+    if count_lines(upload) > max_rows + 1:  # + the CSV header
+        return Response(
+            {'error': f'Files over {max_rows} rows cannot be imported over HTTP; '
+                      'use `manage.py import_products` instead'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    fmt = request.data.get('file_format') or detect_format(upload.name)
+    if fmt not in READERS:
+        return Response({'error': f"Unsupported format '{fmt}'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+    result = import_products(upload.file, fmt, dry_run=dry_run)
+    return Response({'dry_run': dry_run, **result.as_dict()})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_products_view(request):
+    """Stream all products as CSV (default) or NDJSON (`file_format=ndjson`)"""
+    # `format` itself is reserved by DRF for renderer selection
+    fmt = request.query_params.get('file_format', 'csv')
+    if fmt not in EXPORTERS:
+        return Response({'error': f"Unsupported format '{fmt}'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    queryset = Product.objects.all()
+    if request.query_params.get('active_only', '').lower() in ('1', 'true', 'yes'):
+        queryset = queryset.filter(is_active=True)
+    response = StreamingHttpResponse(EXPORTERS[fmt](queryset), content_type=BULK_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+    return response
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_price_stock_update(request):
+    """
+    Apply a batch of price/stock changes by SKU (ERP sync). Body is a list of
+    {sku, price, compare_price, stock_quantity, warehouse_code, quantity}
+    items, or {"items": [...]}. All items are applied in one transaction, or
+    none are and the invalid ones are listed.
+    """
+    items = request.data.get('items') if isinstance(request.data, dict) else request.data
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'Expected a non-empty list of items'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        result = sync_prices_and_stock(items)
+    except SyncError as e:
+        return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result)
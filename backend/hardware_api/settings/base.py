@@ -40,6 +40,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "apps.core.middleware.RequestTimingMiddleware",  # No-op unless REQUEST_TIMING_ENABLED
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # Right after SecurityMiddleware
     "corsheaders.middleware.CorsMiddleware",
@@ -149,6 +150,15 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@hardware-ecommerce.com')
 ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', 'admin@hardware-ecommerce.com')
 
+# Order email outbox (drained by `manage.py send_order_notifications`)
+ORDER_EMAIL_TRANSPORT = os.getenv('ORDER_EMAIL_TRANSPORT', 'auto')  # auto, resend or django
+ORDER_EMAIL_RATE_LIMIT = float(os.getenv('ORDER_EMAIL_RATE_LIMIT', '2'))  # emails per second
+ORDER_EMAIL_MAX_ATTEMPTS = int(os.getenv('ORDER_EMAIL_MAX_ATTEMPTS', '5'))
+
+# Per-request timing: Server-Timing header, log line and /api/core/timings/
+REQUEST_TIMING_ENABLED = os.getenv('REQUEST_TIMING_ENABLED', 'false').lower() in {'1', 'true', 'yes'}
+REQUEST_TIMING_WINDOW = int(os.getenv('REQUEST_TIMING_WINDOW', '1000'))  # recent samples kept per route
+
 # Template configuration
 TEMPLATES = [
     {
@@ -217,6 +227,8 @@ CORS_ALLOW_METHODS = [
 CORS_EXPOSE_HEADERS = [
     'content-type',
     'x-csrftoken',
+    'etag',
+    'server-timing',
 ]
 
 DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "GHS")
@@ -230,3 +242,5 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 UPLOAD_FILE_MAX_SIZE = 5242880  # 5MB
+# Rows accepted by the product import endpoint; larger files go through `manage.py import_products`
+PRODUCT_IMPORT_MAX_ROWS = int(os.getenv('PRODUCT_IMPORT_MAX_ROWS', '10000'))
@@ -1,3 +1,6 @@
 from .base import *  # noqa
 
 DEBUG = True
+
+# Print order emails to the console instead of calling Resend/SMTP
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -24,19 +24,29 @@ DATABASES = {
     )
 }
 
-# Caching (optimized for 512MB RAM)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000,  # Reduced for memory
+# Caching shared by all gunicorn workers: Redis when REDIS_URL is set (needs
+# the optional `redis` package), otherwise a file-based cache on local disk
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', '/tmp/hardware-api-cache'),
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            }
         }
     }
-}
 
-# Session (optimized for memory)
-SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+# Sessions: written through to the database so they survive cache eviction
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_CACHE_ALIAS = 'default'
 
 # Logging (minimal for production)
@@ -93,6 +103,7 @@ WHITENOISE_ALLOW_ALL_ORIGINS = False  # Security: don't allow all origins
 
 # Middleware (stripped for 512MB RAM optimization)
 MIDDLEWARE = [
+    'apps.core.middleware.RequestTimingMiddleware',  # No-op unless REQUEST_TIMING_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Right after SecurityMiddleware
     'corsheaders.middleware.CorsMiddleware',